@@ -0,0 +1,103 @@
+import orjson
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from authentication.models import User
+from configuration.split import current_split
+from results.calendars import schedule
+from results.models import MatchPlayerStat
+from teams.models import Team
+from teams.tests import create_team
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # The split is read once per process, not by each request
+        current_split()
+        staff = User.objects.create(username="staff")
+        for league in (1, 2):
+            for number in range(4):
+                create_team(staff, f"Team {league}{number}", league=league)
+            schedule(league, 1)
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        return response, orjson.loads(response.content)
+
+    def test_pages_follow_each_other_with_a_cursor(self):
+        response, everything = self.get("api_standings")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(len(everything["results"]), 8)
+        self.assertIsNone(everything["next"])
+
+        rows, after = [], ""
+        while after is not None:
+            response, page = self.get("api_standings", limit=3, after=after)
+            self.assertLessEqual(len(page["results"]), 3)
+            rows += page["results"]
+            after = page["next"]
+        self.assertEqual(rows, everything["results"])
+        self.assertEqual(
+            [(row["league"], row["position"]) for row in rows[3:5]], [(1, 4), (2, 1)]
+        )
+
+    def test_only_the_selected_fields_are_returned(self):
+        response, page = self.get(
+            "api_standings", league=2, fields="team_name,wins", limit=2
+        )
+        self.assertEqual(
+            page["results"],
+            [{"team_name": "Team 20", "wins": 0}, {"team_name": "Team 21", "wins": 0}],
+        )
+        self.assertEqual(page["next"], "2.2")
+
+    def test_teams_come_with_their_players_in_two_queries(self):
+        with self.assertNumQueries(2):
+            response, page = self.get("api_teams", league=1, fields="name,players")
+        first = page["results"][0]
+        self.assertEqual(first["name"], "Team 10")
+        self.assertEqual(
+            [player["name"] for player in first["players"]],
+            ["Team 10 1", "Team 10 2", "Team 10 3"],
+        )
+
+    def test_the_calendar_is_filtered_by_league_and_week(self):
+        response, page = self.get("api_calendar", league=2, week=1)
+        self.assertEqual(len(page["results"]), 2)
+        for match in page["results"]:
+            self.assertEqual((match["league"], match["week"]), (2, 1))
+
+    def test_players_carry_their_team(self):
+        response, page = self.get("api_players", fields="name,team_id", limit=1)
+        team = Team.objects.get(name="Team 10")
+        self.assertEqual(page["results"], [{"name": "Team 10 1", "team_id": team.id}])
+
+    def test_players_follow_their_statistics_rows(self):
+        response, page = self.get("api_players", fields="name,goals", limit=1)
+        self.assertEqual(page["results"], [{"name": "Team 10 1", "goals": 0}])
+
+        row = MatchPlayerStat.objects.filter(player__name="Team 10 1").first()
+        row.goals = 7
+        with self.captureOnCommitCallbacks(execute=True):
+            row.save()
+        response, page = self.get("api_players", fields="name,goals", limit=1)
+        self.assertEqual(page["results"], [{"name": "Team 10 1", "goals": 7}])
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({"fields": "name,secret"}, {"limit": "all"}, {"after": "1"}):
+            response, body = self.get("api_standings", **params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("error", body)
+
+    def test_cached_answers_skip_the_database_and_are_validated(self):
+        response, page = self.get("api_players", limit=10)
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse("api_players"), {"limit": 10})
+        self.assertEqual(cached.content, response.content)
+
+        not_modified = self.client.get(
+            reverse("api_players"), {"limit": 10}, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(not_modified.status_code, 304)
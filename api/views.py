@@ -0,0 +1,272 @@
+import orjson
+from django.db.models import F, FilteredRelation, Q
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+
+from configuration.split import current_split
+from interligue.pages import cached_page
+from results.models import Match, Standing
+from teams.models import Player, Team, TeamMembership
+
+# Largest number of rows returned per page, and the default
+PAGE_SIZE = 100
+
+# Query parameters of every endpoint: the fields to return, the cursor of the last
+# row of the previous page and the number of rows
+QUERY = ("fields", "after", "limit")
+
+# Fields of each endpoint, mapped to the column they are read from
+STANDING_FIELDS = {
+    "league": "league",
+    "position": "position",
+    "zone": "zone",
+    "team_id": "team_id",
+    "team_name": "team__name",
+    "matches_played": "matches_played",
+    "wins": "wins",
+    "lose": "lose",
+    "bo_diff": "bo_diff",
+    "bo_wins": "bo_wins",
+    "bo_lose": "bo_lose",
+}
+MATCH_FIELDS = {
+    "id": "id",
+    "league": "league",
+    "week": "week",
+    "date": "date",
+    "team_A_id": "team_A_id",
+    "team_A_name": "team_A__name",
+    "team_A_score": "team_A_score",
+    "team_B_id": "team_B_id",
+    "team_B_name": "team_B__name",
+    "team_B_score": "team_B_score",
+}
+TEAM_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "acronym": "acronym",
+    "league": "league",
+    # Filled from the memberships once the page of teams is read
+    "players": None,
+}
+PLAYER_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "tracker": "tracker",
+    "team_id": "membership__team_id",
+    "score": "score",
+    "goals": "goals",
+    "assists": "assists",
+    "saves": "saves",
+    "shots": "shots",
+}
+
+
+@require_safe
+@cached_page("api_standings", QUERY + ("league",))
+def standings(request):
+    """
+    Returns the standings of the current split, league by league.
+
+    Args:
+        request (HttpRequest): The HTTP request object, which can filter on `league`.
+
+    Returns:
+        HttpResponse: The JSON response.
+    """
+
+    try:
+        rows = Standing.objects.filter(
+            split=current_split(), **_filters(request, "league")
+        )
+        rows, after = paginate(request, rows, STANDING_FIELDS, ("league", "position"))
+    except ValueError as error:
+        return _error(error)
+    return _json({"results": rows, "next": after})
+
+
+@require_safe
+@cached_page("api_calendar", QUERY + ("league", "week"))
+def calendar(request):
+    """
+    Returns the matches of the current split, league by league.
+
+    Args:
+        request (HttpRequest): The HTTP request object, which can filter on `league`
+            and `week`.
+
+    Returns:
+        HttpResponse: The JSON response.
+    """
+
+    try:
+        rows = Match.objects.filter(
+            split=current_split(), **_filters(request, "league", "week")
+        )
+        rows, after = paginate(request, rows, MATCH_FIELDS, ("league", "id"))
+    except ValueError as error:
+        return _error(error)
+    return _json({"results": rows, "next": after})
+
+
+@require_safe
+@cached_page("api_teams", QUERY + ("league",))
+def teams(request):
+    """
+    Returns the teams of the current split and their players.
+
+    Args:
+        request (HttpRequest): The HTTP request object, which can filter on `league`.
+
+    Returns:
+        HttpResponse: The JSON response.
+    """
+
+    try:
+        rows = Team.objects.filter(split=current_split(), **_filters(request, "league"))
+        rows, after = paginate(request, rows, TEAM_FIELDS, ("id",), _add_players)
+    except ValueError as error:
+        return _error(error)
+    return _json({"results": rows, "next": after})
+
+
+@require_safe
+@cached_page("api_players", QUERY)
+def players(request):
+    """
+    Returns the players of the current split, their team and their statistics.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The JSON response.
+    """
+
+    try:
+        rows = Player.objects.filter(split=current_split()).annotate(
+            membership=FilteredRelation(
+                "memberships", condition=Q(memberships__left__isnull=True)
+            )
+        )
+        rows, after = paginate(request, rows, PLAYER_FIELDS, ("id",))
+    except ValueError as error:
+        return _error(error)
+    return _json({"results": rows, "next": after})
+
+
+def paginate(request, queryset, fields, keys, complete=None):
+    """
+    Reads a page of rows selected with keyset pagination.
+
+    The rows are ordered by `keys` and the page starts after the row whose keys
+    are given by the `after` parameter, so that reading a page never counts or
+    skips the rows before it.
+
+    Args:
+        request (HttpRequest): The request, with the `fields`, `after` and `limit`
+            parameters.
+        queryset (QuerySet): The rows to read.
+        fields (dict): The columns each field can be read from.
+        keys (tuple): The integer fields, unique together, the rows are ordered by.
+        complete (function): Called with the rows of the page, keys included, to
+            fill in the fields with no column.
+
+    Returns:
+        tuple: The rows of the page as dictionaries, and the cursor of the next page
+        or None if this is the last one.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+
+    selected = _selected(request, fields)
+    try:
+        limit = min(int(request.GET.get("limit", PAGE_SIZE)), PAGE_SIZE)
+    except ValueError:
+        raise ValueError("La limite doit être un nombre entier.")
+    if limit < 1:
+        raise ValueError("La limite doit être positive.")
+
+    after = request.GET.get("after")
+    if after:
+        try:
+            values = [int(value) for value in after.split(".")]
+        except ValueError:
+            values = []
+        if len(values) != len(keys):
+            raise ValueError("Le curseur est invalide.")
+        # Rows whose keys come after the cursor, in the order of the keys
+        condition = Q(**{f"{keys[-1]}__gt": values[-1]})
+        for key, value in zip(keys[-2::-1], values[-2::-1]):
+            condition = Q(**{f"{key}__gt": value}) | Q(**{key: value}) & condition
+        queryset = queryset.filter(condition)
+
+    # The keys are read for the cursor, the fields with no column are filled in
+    # afterwards
+    columns = [field for field in selected if fields[field] is not None]
+    columns += [key for key in keys if key not in columns]
+    rows = list(
+        queryset.order_by(*keys).values(
+            *(column for column in columns if fields[column] == column),
+            **{
+                column: F(fields[column])
+                for column in columns
+                if fields[column] != column
+            },
+        )[: limit + 1]
+    )
+
+    after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        after = ".".join(str(rows[-1][key]) for key in keys)
+    extra = [field for field in selected if fields[field] is None]
+    if extra and rows:
+        for row in rows:
+            row.update((field, []) for field in extra)
+        complete(rows)
+    return [{field: row[field] for field in selected} for row in rows], after
+
+
+def _add_players(teams):
+    # Players of the teams of the page, with one query
+    rosters = {team["id"]: team["players"] for team in teams}
+    for team_id, slot, player_id, name in (
+        TeamMembership.objects.filter(team_id__in=rosters, left__isnull=True)
+        .order_by("slot")
+        .values_list("team_id", "slot", "player_id", "player__name")
+    ):
+        rosters[team_id].append({"slot": slot, "id": player_id, "name": name})
+
+
+def _selected(request, fields):
+    requested = request.GET.get("fields")
+    if not requested:
+        return tuple(fields)
+    selected = tuple(dict.fromkeys(requested.split(",")))
+    unknown = set(selected) - fields.keys()
+    if unknown:
+        raise ValueError(f"Champs inconnus : {', '.join(sorted(unknown))}.")
+    return selected
+
+
+def _filters(request, *names):
+    filters = {}
+    for name in names:
+        if name in request.GET:
+            try:
+                filters[name] = int(request.GET[name])
+            except ValueError:
+                raise ValueError(f"Le paramètre {name} doit être un nombre entier.")
+    return filters
+
+
+def _json(data, status=200):
+    return HttpResponse(
+        orjson.dumps(data), status=status, content_type="application/json"
+    )
+
+
+def _error(error):
+    return _json({"error": str(error)}, status=400)
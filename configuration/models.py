@@ -1,9 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
+from configuration.split import touch_stamp
+
 
 class Configuration(models.Model):
     split = models.IntegerField(default="1")
@@ -25,7 +27,5 @@ class Configuration(models.Model):
 
 @receiver(post_save, sender=Configuration)
 def update_settings_variable(sender, instance, **kwargs):
-    from interligue import settings
-
-    # Mettre à jour la variable dans le fichier settings
-    settings.split = instance.split
+    # Every process reads the split again once the change is committed
+    transaction.on_commit(touch_stamp)
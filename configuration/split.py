@@ -0,0 +1,54 @@
+import os
+import time
+from pathlib import Path
+
+from interligue import settings
+
+# Split of this process and the stamp it was read under, as (stamp, split)
+_resolved = (None, None)
+
+
+def current_split():
+    """
+    Returns the split the site currently shows.
+
+    The split is read from the configuration once per process and kept until the
+    stamp file is touched by a change of configuration, in any process. Checking
+    the stamp costs a `stat` call, not a query.
+
+    Returns:
+        int: The current split.
+    """
+
+    global _resolved
+
+    stamp = _stamp()
+    if _resolved[0] != stamp:
+        from configuration.models import Configuration
+
+        split = (
+            Configuration.objects.values_list("split", flat=True).first()
+            or settings.split
+        )
+        _resolved = (stamp, split)
+    return _resolved[1]
+
+
+def touch_stamp():
+    """
+    Tells every process that the split has to be read again.
+    """
+
+    path = Path(settings.SPLIT_STAMP_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Always move the stamp forward, even within the resolution of the clock
+    stamp = max(time.time_ns(), _stamp() + 1)
+    path.touch()
+    os.utime(path, ns=(stamp, stamp))
+
+
+def _stamp():
+    try:
+        return os.stat(settings.SPLIT_STAMP_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return 0
@@ -1,3 +1,47 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from configuration import split
+from configuration.models import Configuration
+from configuration.split import current_split
+from interligue import settings
+
+
+class SplitResolverTestCase(TestCase):
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        stamp = mock.patch.object(
+            settings, "SPLIT_STAMP_FILE", Path(directory.name) / "split.stamp"
+        )
+        stamp.start()
+        self.addCleanup(stamp.stop)
+        resolved = mock.patch.object(split, "_resolved", (None, None))
+        resolved.start()
+        self.addCleanup(resolved.stop)
+
+    def test_the_split_is_read_once_per_process(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(current_split(), settings.split)
+        with self.assertNumQueries(0):
+            self.assertEqual(current_split(), settings.split)
+
+    def test_a_new_split_is_seen_once_committed(self):
+        current_split()
+        with self.captureOnCommitCallbacks(execute=True):
+            Configuration(split=2).save()
+            self.assertEqual(current_split(), settings.split)
+
+        self.assertEqual(current_split(), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(current_split(), 2)
+
+    def test_a_change_made_by_another_process_is_seen(self):
+        current_split()
+        # Another process saves the configuration and touches the stamp
+        Configuration.objects.create(pk=1, split=3)
+        split.touch_stamp()
+        self.assertEqual(current_split(), 3)
@@ -0,0 +1,232 @@
+from functools import wraps
+import hashlib
+import logging
+import threading
+import time
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.dispatch import Signal, receiver
+from django.http import HttpRequest, HttpResponse
+from django.urls import resolve, reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from configuration.split import current_split
+from interligue import settings
+
+logger = logging.getLogger(__name__)
+
+# Cache keys of the version of the data the public pages are rendered from, and
+# of the time it last changed
+VERSION_KEY = "pages:version"
+MODIFIED_KEY = "pages:modified"
+
+# Public pages, by URL name, that are cached and pre-warmed
+PAGES = (
+    "standings",
+    "calendar",
+    "teams",
+    "api_standings",
+    "api_calendar",
+    "api_teams",
+    "api_players",
+)
+
+# Seconds a rendered page is kept, a new version making it obsolete anyway
+TIMEOUT = 24 * 60 * 60
+
+# Sent with the paths of the public pages once their data has changed
+pages_changed = Signal()
+
+
+def version():
+    """
+    Returns the current version of the data of the public pages.
+
+    Returns:
+        tuple: The version, shared by every process through the cache, and the
+        timestamp of its last change.
+    """
+
+    values = cache.get_many((VERSION_KEY, MODIFIED_KEY))
+    if len(values) < 2:
+        # Start from the clock so that pages cached before a cache loss are not
+        # served again
+        now = time.time()
+        cache.add(VERSION_KEY, int(now * 1000), timeout=None)
+        cache.add(MODIFIED_KEY, now, timeout=None)
+        values = cache.get_many((VERSION_KEY, MODIFIED_KEY))
+    return values[VERSION_KEY], values[MODIFIED_KEY]
+
+
+def page_key(name, split, data_version, query=""):
+    key = f"page:{name}:{split}:{data_version}"
+    if query:
+        key += ":" + hashlib.md5(query.encode()).hexdigest()
+    return key
+
+
+def cached_page(name, query=()):
+    """
+    Decorator caching the rendered content of a public page.
+
+    The page is cached per split and per data version, so that it never has to be
+    invalidated: saving the data moves to a new version.
+
+    Args:
+        name (str): The URL name of the page.
+        query (tuple): The query parameters the page depends on, cached per value.
+            Requests with any other parameter are not cached.
+
+    Returns:
+        function: The decorator.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or set(request.GET) - set(query):
+                return view(request, *args, **kwargs)
+
+            data_version, modified = version()
+            etag = quote_etag(f"{name}-{current_split()}-{data_version}")
+
+            # Clients holding the current version get an empty answer
+            response = get_conditional_response(
+                request, etag=etag, last_modified=int(modified)
+            )
+            if response is None:
+                key = page_key(
+                    name,
+                    current_split(),
+                    data_version,
+                    urlencode(sorted(request.GET.lists()), doseq=True),
+                )
+                cached = cache.get(key)
+                if cached is not None:
+                    content, content_type = cached
+                    response = HttpResponse(content, content_type=content_type)
+                else:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    cache.set(
+                        key, (response.content, response["Content-Type"]), TIMEOUT
+                    )
+
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(modified)
+            # Browsers check again every time, a reverse proxy keeps the page
+            patch_cache_control(
+                response, public=True, max_age=0, s_maxage=settings.PAGES_S_MAXAGE
+            )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate():
+    """
+    Moves the public pages to a new data version once the transaction is committed.
+
+    The version is only bumped after the commit, so that no page can be cached
+    from data that is about to change, and once per commit however many objects
+    were saved. The pages are then rendered again in the background, once for all
+    the commits of the next `PAGES_PREWARM_DELAY` seconds.
+    """
+
+    _state.stale = True
+    transaction.on_commit(_refresh)
+
+
+def prewarm():
+    """
+    Renders the public pages of the current split and data version into the cache.
+    """
+
+    for name in PAGES:
+        request = HttpRequest()
+        request.method = "GET"
+        request.path = request.path_info = reverse(name)
+        resolve(request.path_info).func(request)
+
+
+@receiver(pages_changed)
+def purge_proxy(sender, paths, **kwargs):
+    """
+    Signal receiver function that asks the reverse proxy to forget the public pages.
+
+    Sends a PURGE request per page to `PAGES_PURGE_URL`, if it is set, from a
+    background thread so that a slow proxy never holds up the request that saved
+    the data.
+
+    Args:
+        sender: None.
+        paths: The paths of the public pages.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    if not settings.PAGES_PURGE_URL:
+        return
+    urls = [settings.PAGES_PURGE_URL.rstrip("/") + path for path in paths]
+    threading.Thread(target=_purge, args=(urls,), daemon=True).start()
+
+
+def _purge(urls):
+    for url in urls:
+        try:
+            urlopen(Request(url, method="PURGE"), timeout=2).close()
+        except (URLError, OSError):
+            # The proxy is most likely down for the other pages too
+            logger.warning("Could not purge %s", url)
+            return
+
+
+_state = threading.local()
+
+
+def _refresh():
+    # Only the first callback of a commit has anything left to do
+    if not getattr(_state, "stale", False):
+        return
+    _state.stale = False
+
+    try:
+        cache.incr(VERSION_KEY)
+        cache.set(MODIFIED_KEY, time.time(), timeout=None)
+    except ValueError:
+        version()
+    _prewarm_soon()
+    pages_changed.send(sender=None, paths=[reverse(name) for name in PAGES])
+
+
+# Held from the moment a pre-warm is planned until it starts rendering
+_prewarm_planned = threading.Lock()
+
+
+def _prewarm_soon():
+    # Autocommit saves would otherwise each render every page before returning
+    if settings.PAGES_PREWARM_DELAY is None:
+        return
+    if not _prewarm_planned.acquire(blocking=False):
+        return
+    threading.Thread(target=_prewarm_later, name="pages-prewarm", daemon=True).start()
+
+
+def _prewarm_later():
+    time.sleep(settings.PAGES_PREWARM_DELAY)
+    # The commits from now on may not be seen by this rendering
+    _prewarm_planned.release()
+    try:
+        prewarm()
+    except Exception:
+        # The pages will be rendered by the next requests instead
+        logger.exception("Could not pre-warm the public pages")
+    finally:
+        connections.close_all()
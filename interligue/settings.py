@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     "results",
     "teams",
     "configuration",
+    "api",
 ]
 
 MIDDLEWARE = [
@@ -54,6 +55,7 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "results.middleware.DeferredStatsMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -91,6 +93,26 @@ DATABASES = {
 }
 
 
+# Cache, shared by every worker process
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default=f"filecache://{BASE_DIR / '.cache'}"),
+}
+
+# The tests use an in-memory cache instead
+TEST_RUNNER = "interligue.testing.TestRunner"
+
+# Seconds a reverse proxy may keep the public pages, and the address of the proxy
+# to purge when they change
+PAGES_S_MAXAGE = env.int("PAGES_S_MAXAGE", default=300)
+PAGES_PURGE_URL = env("PAGES_PURGE_URL", default="")
+
+# Seconds to wait after a change before rendering the public pages again, so that
+# a burst of saves is rendered once; None leaves them to the next requests
+PAGES_PREWARM_DELAY = env.float("PAGES_PREWARM_DELAY", default=1.0)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -194,4 +216,11 @@ JAZZMIN_UI_TWEAKS = {
     "actions_sticky_top": False,
 }
 
+# Split shown until one is configured
 split = 1
+
+# File touched whenever the configured split changes, so that every process reads
+# it again
+SPLIT_STAMP_FILE = env.path(
+    "SPLIT_STAMP_FILE", default=BASE_DIR / ".cache" / "split.stamp"
+)
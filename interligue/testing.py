@@ -0,0 +1,34 @@
+from unittest import mock
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from interligue import settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner that keeps the cache in memory, away from the pages cached by the
+    site on disk.
+
+    The public pages are not pre-warmed either, since a background thread cannot
+    see the data of a test transaction; the tests that need it turn it back on.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                }
+            }
+        )
+        self._cache.enable()
+        self._prewarm = mock.patch.object(settings, "PAGES_PREWARM_DELAY", None)
+        self._prewarm.start()
+
+    def teardown_test_environment(self, **kwargs):
+        self._prewarm.stop()
+        self._cache.disable()
+        super().teardown_test_environment(**kwargs)
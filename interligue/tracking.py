@@ -0,0 +1,63 @@
+class FieldTracker:
+    """
+    Model mixin that remembers the values an instance was loaded with.
+
+    The values are keyed by attribute name (`team_A_id` for a foreign key) and are
+    updated with the fields each save writes.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None and len(args) > 3:
+            update_fields = args[3]
+
+        # Only the fields that were written are known to be stored
+        loaded = getattr(self, "_loaded_values", None) or {}
+        for field in self._meta.concrete_fields:
+            if update_fields is None or {field.name, field.attname} & set(
+                update_fields
+            ):
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded
+
+    def writes(self, update_fields, fields):
+        """
+        Tells whether a save writes some fields.
+
+        Args:
+            update_fields (iterable): The `update_fields` of the save, None for a
+                save of every field.
+            fields (iterable): The attribute names of the fields.
+
+        Returns:
+            bool: False only if the save is limited to other fields.
+        """
+
+        if update_fields is None:
+            return True
+        written = {self._meta.get_field(name).attname for name in update_fields}
+        return bool(written & set(fields))
+
+    def loaded_values(self, fields):
+        """
+        Returns the values of some fields as they are stored in the database.
+
+        Args:
+            fields (iterable): The attribute names of the fields.
+
+        Returns:
+            dict: The stored values, or None if the instance was not loaded from the
+            database or some of the fields were deferred.
+        """
+
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None or any(field not in loaded for field in fields):
+            return None
+        return {field: loaded[field] for field in fields}
@@ -7,6 +7,7 @@ from django.contrib.auth.views import (
 )
 from django.urls import path
 
+import api.views
 import authentication.views
 import teams.views
 import results.views
@@ -17,4 +18,13 @@ urlpatterns = [
     path("teams/", teams.views.teams, name="teams"),
     path("calendar/", results.views.calendar, name="calendar"),
     path("standings/", results.views.standings, name="standings"),
+    path(
+        "exports/player-stats.csv",
+        results.views.export_player_stats,
+        name="export_player_stats",
+    ),
+    path("api/v1/standings/", api.views.standings, name="api_standings"),
+    path("api/v1/calendar/", api.views.calendar, name="api_calendar"),
+    path("api/v1/teams/", api.views.teams, name="api_teams"),
+    path("api/v1/players/", api.views.players, name="api_players"),
 ]
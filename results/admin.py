@@ -1,5 +1,31 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
 from results.models import *
+from results.exports import csv_lines, player_stat_rows
+from results.scheduling import schedule_dates
+
+
+class MatchPlayerStatInline(admin.TabularInline):
+    """
+    Inline interface for entering the statistics of each player of a match.
+
+    Args:
+        model (Model): The model edited by the inline.
+        fields (tuple): The fields to display for each player.
+        readonly_fields (tuple): The fields that are read-only for each player.
+    """
+
+    model = MatchPlayerStat
+    fields = ("side", "slot", "player", "score", "goals", "assists", "saves", "shots")
+    readonly_fields = ("side", "slot", "player")
+    extra = 0
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("player")
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 class MatchAdmin(admin.ModelAdmin):
@@ -13,6 +39,8 @@ class MatchAdmin(admin.ModelAdmin):
         ordering (tuple): The fields to order by in the list view.
         fieldsets (tuple): The fields to display in the detail view and how they are grouped.
         readonly_fields (tuple): The fields that are read-only in the detail view.
+        inlines (tuple): The statistics of the players, edited in the detail view.
+        actions (tuple): The actions available on the selected matches.
     """
 
     list_display = ("week", "date", "team_A", "team_B", "league")
@@ -26,6 +54,7 @@ class MatchAdmin(admin.ModelAdmin):
                 "fields": (
                     "league",
                     "week",
+                    "slot",
                     "date",
                     "split",
                 ),
@@ -42,163 +71,33 @@ class MatchAdmin(admin.ModelAdmin):
                 ),
             },
         ),
-        (
-            "Team A Player 1",
-            {
-                "fields": (
-                    "team_A_player_1",
-                    "team_A_player_1_score",
-                    "team_A_player_1_goals",
-                    "team_A_player_1_assists",
-                    "team_A_player_1_saves",
-                    "team_A_player_1_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team A Player 2",
-            {
-                "fields": (
-                    "team_A_player_2",
-                    "team_A_player_2_score",
-                    "team_A_player_2_goals",
-                    "team_A_player_2_assists",
-                    "team_A_player_2_saves",
-                    "team_A_player_2_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team A Player 3",
-            {
-                "fields": (
-                    "team_A_player_3",
-                    "team_A_player_3_score",
-                    "team_A_player_3_goals",
-                    "team_A_player_3_assists",
-                    "team_A_player_3_saves",
-                    "team_A_player_3_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team A Player 4",
-            {
-                "fields": (
-                    "team_A_player_4",
-                    "team_A_player_4_score",
-                    "team_A_player_4_goals",
-                    "team_A_player_4_assists",
-                    "team_A_player_4_saves",
-                    "team_A_player_4_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team A Player 5",
-            {
-                "fields": (
-                    "team_A_player_5",
-                    "team_A_player_5_score",
-                    "team_A_player_5_goals",
-                    "team_A_player_5_assists",
-                    "team_A_player_5_saves",
-                    "team_A_player_5_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team B Player 1",
-            {
-                "fields": (
-                    "team_B_player_1",
-                    "team_B_player_1_score",
-                    "team_B_player_1_goals",
-                    "team_B_player_1_assists",
-                    "team_B_player_1_saves",
-                    "team_B_player_1_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team B Player 2",
-            {
-                "fields": (
-                    "team_B_player_2",
-                    "team_B_player_2_score",
-                    "team_B_player_2_goals",
-                    "team_B_player_2_assists",
-                    "team_B_player_2_saves",
-                    "team_B_player_2_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team B Player 3",
-            {
-                "fields": (
-                    "team_B_player_3",
-                    "team_B_player_3_score",
-                    "team_B_player_3_goals",
-                    "team_B_player_3_assists",
-                    "team_B_player_3_saves",
-                    "team_B_player_3_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team B Player 4",
-            {
-                "fields": (
-                    "team_B_player_4",
-                    "team_B_player_4_score",
-                    "team_B_player_4_goals",
-                    "team_B_player_4_assists",
-                    "team_B_player_4_saves",
-                    "team_B_player_4_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
-        (
-            "Team B Player 5",
-            {
-                "fields": (
-                    "team_B_player_5",
-                    "team_B_player_5_score",
-                    "team_B_player_5_goals",
-                    "team_B_player_5_assists",
-                    "team_B_player_5_saves",
-                    "team_B_player_5_shots",
-                ),
-                "classes": ("collapse",),
-            },
-        ),
     )
     readonly_fields = (
         "split",
         "league",
         "team_A",
         "team_B",
-        "team_A_player_1",
-        "team_A_player_2",
-        "team_A_player_3",
-        "team_A_player_4",
-        "team_A_player_5",
-        "team_B_player_1",
-        "team_B_player_2",
-        "team_B_player_3",
-        "team_B_player_4",
-        "team_B_player_5",
     )
+    inlines = (MatchPlayerStatInline,)
+    actions = ("schedule_dates", "export_player_stats")
+
+    @admin.action(description="Planifier les dates des matchs sélectionnés")
+    def schedule_dates(self, request, queryset):
+        placed, violations, elapsed = schedule_dates(queryset)
+        self.message_user(
+            request,
+            f"{placed} matchs planifiés en {elapsed * 1000:.0f} ms, "
+            f"{violations} contraintes non respectées.",
+            messages.WARNING if violations else messages.SUCCESS,
+        )
+
+    @admin.action(description="Exporter les statistiques des joueurs (CSV)")
+    def export_player_stats(self, request, queryset):
+        response = StreamingHttpResponse(
+            csv_lines(player_stat_rows(queryset)), content_type="text/csv"
+        )
+        response["Content-Disposition"] = 'attachment; filename="statistiques.csv"'
+        return response
 
     def has_add_permission(self, request):
         return False
@@ -210,4 +109,69 @@ class MatchAdmin(admin.ModelAdmin):
             return False
 
 
+class SlotAdmin(admin.ModelAdmin):
+    """
+    Admin interface for managing the time slots matches can be placed in.
+
+    Args:
+        list_display (tuple): The fields to display in the list view.
+        list_filter (tuple): The fields to filter by in the list view.
+    """
+
+    list_display = ("date", "time", "capacity")
+    list_filter = ("date",)
+
+
+class UnavailabilityAdmin(admin.ModelAdmin):
+    """
+    Admin interface for managing the dates teams cannot play.
+
+    Args:
+        list_display (tuple): The fields to display in the list view.
+        list_filter (tuple): The fields to filter by in the list view.
+        autocomplete_fields (tuple): The fields selected with a search box.
+    """
+
+    list_display = ("team", "date")
+    list_filter = ("team__league",)
+    autocomplete_fields = ("team",)
+
+
+class StandingAdmin(admin.ModelAdmin):
+    """
+    Admin interface for reading the standings, which are computed from the results.
+
+    Args:
+        list_display (tuple): The fields to display in the list view.
+        list_filter (tuple): The fields to filter by in the list view.
+        list_select_related (tuple): The relations loaded with the list view.
+    """
+
+    list_display = (
+        "league",
+        "position",
+        "team",
+        "matches_played",
+        "wins",
+        "lose",
+        "bo_diff",
+        "bo_wins",
+        "bo_lose",
+    )
+    list_filter = ("split", "league")
+    list_select_related = ("team",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Match, MatchAdmin)
+admin.site.register(Slot, SlotAdmin)
+admin.site.register(Standing, StandingAdmin)
+admin.site.register(Unavailability, UnavailabilityAdmin)
@@ -1,14 +1,186 @@
+from interligue import pages
 from teams.models import Team
-from itertools import combinations
-
-
-def calendar(league):
-    teams = Team.objects.filter(league=league)
-    team_list = list(teams)
-    # Convert queryset to list to be able to use combination
-    matches = []
-    for match in combinations(team_list, 2):
-        # Generate all combinations of two teams
-        matches.append(match)
-        # Add each generated match to the match list
-    return matches
+
+
+def round_robin(teams, double=False):
+    """
+    Schedules a round-robin tournament between teams with the circle method.
+
+    The first team stays in place while the others rotate around it, so that every
+    team meets every other once and plays at most once a week. With an odd number
+    of teams, the fixed place is a bye. Sides alternate so that each team plays as
+    many matches as team A as team B, give or take one.
+
+    Args:
+        teams (list): The teams, or their ids.
+        double (bool): Whether the teams meet a second time with the sides swapped.
+
+    Returns:
+        list: The weeks of the tournament, each a list of (team A, team B) pairs.
+    """
+
+    teams = list(teams)
+    if not teams:
+        return []
+    if len(teams) % 2:
+        teams.insert(0, None)
+    size = len(teams)
+    fixed, rotating = teams[0], teams[1:]
+
+    weeks = []
+    for week in range(size - 1):
+        circle = [fixed] + rotating
+        pairs = []
+        for position in range(size // 2):
+            team_a, team_b = circle[position], circle[size - 1 - position]
+            if team_a is None or team_b is None:
+                continue
+            # The fixed team changes sides every week, the others by position
+            if (week if position == 0 else position) % 2:
+                team_a, team_b = team_b, team_a
+            pairs.append((team_a, team_b))
+        weeks.append(pairs)
+        rotating = rotating[-1:] + rotating[:-1]
+
+    if double:
+        weeks += [[(team_b, team_a) for team_a, team_b in pairs] for pairs in weeks]
+    return weeks
+
+
+def calendar(league, split=None):
+    """
+    Returns every pairing of the teams of a league.
+
+    Args:
+        league (int): The league of the teams.
+        split (int): Only pair the teams of this split.
+
+    Returns:
+        list: The pairs of teams that have to play each other, week by week.
+    """
+
+    teams = Team.objects.filter(league=league).order_by("id")
+    if split is not None:
+        teams = teams.filter(split=split)
+    return [pair for pairs in round_robin(teams) for pair in pairs]
+
+
+def assign_weeks(matches, weeks):
+    """
+    Finds a week for the matches that have none, keeping the others in place.
+
+    A match takes the week the round-robin gives its pairing when both teams are
+    free that week, and the first week where both are free otherwise. The weeks
+    each team is busy are kept as bitsets.
+
+    Args:
+        matches (list): The matches as (key, team A id, team B id, week) tuples,
+            the week being None when the match is not scheduled yet.
+        weeks (list): The round-robin weeks of (team A id, team B id) pairs.
+
+    Returns:
+        dict: The week found for each unscheduled match, keyed by match key.
+    """
+
+    ideal = {}
+    for week, pairs in enumerate(weeks, 1):
+        for pair in pairs:
+            ideal.setdefault(pair, week)
+
+    busy = {}
+    for key, team_a, team_b, week in matches:
+        if week is not None:
+            busy[team_a] = busy.get(team_a, 0) | 1 << week
+            busy[team_b] = busy.get(team_b, 0) | 1 << week
+
+    def target(match):
+        key, team_a, team_b, week = match
+        return ideal.get((team_a, team_b)) or ideal.get((team_b, team_a)) or 0
+
+    found = {}
+    for match in sorted((m for m in matches if m[3] is None), key=target):
+        key, team_a, team_b, week = match
+        taken = busy.get(team_a, 0) | busy.get(team_b, 0)
+        week = target(match)
+        if not week or taken >> week & 1:
+            # Lowest week, from the first one, where neither team plays
+            free = ~taken & ~1
+            week = (free & -free).bit_length() - 1
+        busy[team_a] = busy.get(team_a, 0) | 1 << week
+        busy[team_b] = busy.get(team_b, 0) | 1 << week
+        found[key] = week
+    return found
+
+
+def schedule(league, split, double=False):
+    """
+    Assigns a week to every match of a league that has none.
+
+    Weeks already assigned are kept, so that a late-registered team is fitted
+    around the matches already scheduled or played. For a double round-robin, the
+    return matches that are missing are created with the sides swapped.
+
+    Args:
+        league (int): The league to schedule.
+        split (int): The split of the league.
+        double (bool): Whether the teams meet twice.
+
+    Returns:
+        tuple: The number of matches created and the number of matches scheduled.
+    """
+
+    from results.models import Match, MatchPlayerStat
+
+    team_ids = list(
+        Team.objects.filter(league=league, split=split)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    weeks = round_robin(team_ids, double)
+    matches = list(
+        Match.objects.filter(league=league, split=split).only(
+            "id", "week", "team_A_id", "team_B_id"
+        )
+    )
+
+    # Return matches of the pairings that are only played once
+    created = []
+    if double:
+        legs = {}
+        for match in matches:
+            legs.setdefault(frozenset((match.team_A_id, match.team_B_id)), []).append(
+                match
+            )
+        created = [
+            Match(
+                league=league,
+                split=split,
+                team_A_id=pair[0].team_B_id,
+                team_B_id=pair[0].team_A_id,
+            )
+            for pair in legs.values()
+            if len(pair) == 1
+        ]
+
+    all_matches = matches + created
+    found = assign_weeks(
+        [
+            (key, match.team_A_id, match.team_B_id, match.week)
+            for key, match in enumerate(all_matches)
+        ],
+        weeks,
+    )
+    for key, week in found.items():
+        all_matches[key].week = week
+
+    if created:
+        Match.objects.bulk_create(created)
+        MatchPlayerStat.create_for_matches(
+            Match.objects.filter(league=league, split=split, player_stats__isnull=True)
+        )
+    Match.objects.bulk_update(
+        [matches[key] for key in found if key < len(matches)], ["week"], batch_size=500
+    )
+    if found:
+        pages.invalidate()
+    return len(created), len(found)
@@ -0,0 +1,178 @@
+import csv
+
+from django.db.models import Case, F, When
+
+# Columns of the export, one line per player per match
+COLUMNS = (
+    "match_id",
+    "split",
+    "league",
+    "week",
+    "date",
+    "side",
+    "slot",
+    "team",
+    "opponent",
+    "team_score",
+    "opponent_score",
+    "player_id",
+    "player",
+    "score",
+    "goals",
+    "assists",
+    "saves",
+    "shots",
+)
+
+
+def player_stat_rows(matches=None, split=None, league=None, chunk_size=2000):
+    """
+    Iterates over the statistics of every player of every match, as tuples.
+
+    The rows are read as tuples in chunks, whatever their number, so that memory
+    use does not grow with the number of matches exported.
+
+    Args:
+        matches (QuerySet): Only export these matches.
+        split (int): Only export the matches of this split.
+        league (int): Only export the matches of this league.
+        chunk_size (int): The number of rows fetched from the database at once.
+
+    Yields:
+        tuple: The values of a line, in the order of `COLUMNS`.
+    """
+
+    from results.models import MatchPlayerStat
+
+    rows = MatchPlayerStat.objects.all()
+    if matches is not None:
+        rows = rows.filter(match__in=matches)
+    if split is not None:
+        rows = rows.filter(match__split=split)
+    if league is not None:
+        rows = rows.filter(match__league=league)
+
+    rows = rows.annotate(
+        team=_by_side("match__team_A__name", "match__team_B__name"),
+        opponent=_by_side("match__team_B__name", "match__team_A__name"),
+        team_score=_by_side("match__team_A_score", "match__team_B_score"),
+        opponent_score=_by_side("match__team_B_score", "match__team_A_score"),
+    )
+    yield from (
+        rows.order_by("match_id", "side", "slot")
+        .values_list(
+            "match_id",
+            "match__split",
+            "match__league",
+            "match__week",
+            "match__date",
+            "side",
+            "slot",
+            "team",
+            "opponent",
+            "team_score",
+            "opponent_score",
+            "player_id",
+            "player__name",
+            "score",
+            "goals",
+            "assists",
+            "saves",
+            "shots",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def csv_lines(rows):
+    """
+    Formats rows as CSV, one line at a time, starting with the header.
+
+    Args:
+        rows (iterable): The rows, as tuples in the order of `COLUMNS`.
+
+    Yields:
+        str: The lines of the CSV file.
+    """
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_parquet(rows, path, batch_size=10000):
+    """
+    Writes rows into a Parquet file, one batch at a time.
+
+    Args:
+        rows (iterable): The rows, as tuples in the order of `COLUMNS`.
+        path (str): The path of the file to write.
+        batch_size (int): The number of rows held in memory and written at once.
+
+    Returns:
+        int: The number of rows written.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema(
+        [
+            ("match_id", pyarrow.int64()),
+            ("split", pyarrow.int32()),
+            ("league", pyarrow.int32()),
+            ("week", pyarrow.int32()),
+            ("date", pyarrow.date32()),
+            ("side", pyarrow.string()),
+            ("slot", pyarrow.int8()),
+            ("team", pyarrow.string()),
+            ("opponent", pyarrow.string()),
+            ("team_score", pyarrow.int32()),
+            ("opponent_score", pyarrow.int32()),
+            ("player_id", pyarrow.int64()),
+            ("player", pyarrow.string()),
+            ("score", pyarrow.int32()),
+            ("goals", pyarrow.int32()),
+            ("assists", pyarrow.int32()),
+            ("saves", pyarrow.int32()),
+            ("shots", pyarrow.int32()),
+        ]
+    )
+
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                writer.write_table(_table(pyarrow, schema, batch))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_table(_table(pyarrow, schema, batch))
+            count += len(batch)
+    return count
+
+
+def _table(pyarrow, schema, batch):
+    # Columns of the batch, built from its rows
+    columns = list(zip(*batch)) or [[] for column in COLUMNS]
+    return pyarrow.Table.from_arrays(
+        [pyarrow.array(column, field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _by_side(side_a, side_b):
+    # A column of the match, seen from the side of the player
+    return Case(When(side="A", then=F(side_a)), default=F(side_b))
+
+
+class _Echo:
+    # File-like object that hands back what the CSV writer writes into it
+    def write(self, value):
+        return value
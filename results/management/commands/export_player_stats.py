@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from results.exports import csv_lines, player_stat_rows, write_parquet
+
+
+class Command(BaseCommand):
+    help = "Exporte les statistiques de chaque joueur de chaque match."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--split", type=int, help="Split à exporter.")
+        parser.add_argument("--league", type=int, help="Ligue à exporter.")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "parquet"),
+            default="csv",
+            help="Format du fichier, parquet nécessitant pyarrow.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Fichier à écrire, la sortie standard par défaut pour le CSV.",
+        )
+
+    def handle(self, *args, **options):
+        rows = player_stat_rows(split=options["split"], league=options["league"])
+        output = options["output"]
+        start = time.perf_counter()
+
+        if options["format"] == "parquet":
+            if not output:
+                raise CommandError("L'export Parquet nécessite --output.")
+            try:
+                count = write_parquet(rows, output)
+            except ImportError:
+                raise CommandError("L'export Parquet nécessite pyarrow.")
+        else:
+            stream = open(output, "w", newline="") if output else self.stdout
+            try:
+                # The header is not counted
+                count = -1
+                for line in csv_lines(rows):
+                    stream.write(line)
+                    count += 1
+            finally:
+                if output:
+                    stream.close()
+        if output:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{count} lignes exportées en {time.perf_counter() - start:.2f} s."
+                )
+            )
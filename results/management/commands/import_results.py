@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from results.scoresheets import ScoreSheetError, import_results, read_score_sheet
+
+
+class Command(BaseCommand):
+    help = "Importe les résultats d'une feuille de scores CSV ou JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Feuille de scores, en .csv ou en .json.")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Affiche les différences sans les enregistrer.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            lines = read_score_sheet(options["file"])
+            differences = import_results(lines, dry_run=options["dry_run"])
+        except OSError as error:
+            raise CommandError(f"Impossible de lire {options['file']} : {error}")
+        except ValueError as error:
+            raise CommandError(f"Feuille de scores illisible : {error}")
+        except ScoreSheetError as error:
+            raise CommandError(f"Feuille de scores refusée :\n{error}")
+
+        for difference in differences:
+            self.stdout.write(difference)
+        verb = "à enregistrer" if options["dry_run"] else "enregistrées"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(differences)} différences {verb} "
+                f"en {time.perf_counter() - start:.2f} s."
+            )
+        )
@@ -0,0 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor
+import time
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from interligue import pages
+from results import stats
+from teams.models import Player, Team
+
+
+def league_totals(split, league, batch_size):
+    """
+    Computes the statistics of one league, in a worker process.
+
+    The workers only read: the counters are written by the parent process, in one
+    transaction, once every league is computed.
+
+    Args:
+        split (int): The split of the league, or None for every split.
+        league (int): The league to compute.
+        batch_size (int): The number of rows read per chunk.
+
+    Returns:
+        tuple: The counters of the players and of the teams, keyed by id.
+    """
+
+    return stats.totals(split=split, league=league, batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques des joueurs et des équipes à partir des matchs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--split", type=int, help="Split à recalculer.")
+        parser.add_argument("--league", type=int, help="Ligue à recalculer.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Nombre d'objets écrits par requête.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Nombre de processus entre lesquels répartir les ligues.",
+        )
+
+    def handle(self, *args, **options):
+        split = options["split"]
+        league = options["league"]
+        batch_size = options["batch_size"]
+        start = time.perf_counter()
+
+        if league is not None or options["processes"] <= 1:
+            players, teams = stats.rebuild(split, league, batch_size)
+        else:
+            leagues = Team.objects.all()
+            if split is not None:
+                leagues = leagues.filter(split=split)
+            leagues = list(
+                leagues.order_by("league").values_list("league", flat=True).distinct()
+            )
+
+            # The workers open their own connections to the database
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options["processes"], initializer=django.setup
+            ) as executor:
+                results = list(
+                    executor.map(
+                        league_totals,
+                        [split] * len(leagues),
+                        leagues,
+                        [batch_size] * len(leagues),
+                    )
+                )
+
+            # A player who played in several leagues has the same totals in each
+            player_totals, team_totals = {}, {}
+            for league_players, league_teams in results:
+                player_totals.update(league_players)
+                team_totals.update(league_teams)
+
+            # The players of the split that no league reaches, such as free agents,
+            # are rebuilt too, as in a single process
+            players = Player.objects.all()
+            if split is not None:
+                players = players.filter(split=split)
+            player_totals.update(
+                stats.player_totals(
+                    set(players.values_list("id", flat=True)) - set(player_totals),
+                    batch_size,
+                )
+            )
+            with transaction.atomic():
+                stats.save_totals(player_totals, team_totals, batch_size)
+                pages.invalidate()
+            players, teams = len(player_totals), len(team_totals)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{players} joueurs et {teams} équipes recalculés "
+                f"en {time.perf_counter() - start:.2f} s."
+            )
+        )
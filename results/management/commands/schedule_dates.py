@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from configuration.split import current_split
+from results.models import Match
+from results.scheduling import schedule_dates
+
+
+class Command(BaseCommand):
+    help = "Place les matchs non joués dans les créneaux disponibles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--split", type=int, help="Split à planifier, le split actuel par défaut."
+        )
+        parser.add_argument("--league", type=int, help="Ligue à planifier.")
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Replace aussi les matchs qui ont déjà un créneau.",
+        )
+
+    def handle(self, *args, **options):
+        matches = Match.objects.filter(split=options["split"] or current_split())
+        if options["league"] is not None:
+            matches = matches.filter(league=options["league"])
+        if not options["all"]:
+            matches = matches.filter(slot__isnull=True)
+
+        placed, violations, elapsed = schedule_dates(matches)
+        style = self.style.WARNING if violations else self.style.SUCCESS
+        self.stdout.write(
+            style(
+                f"{placed} matchs planifiés en {elapsed * 1000:.0f} ms, "
+                f"{violations} contraintes non respectées."
+            )
+        )
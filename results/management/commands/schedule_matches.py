@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from configuration.split import current_split
+from results.calendars import schedule
+from teams.models import Team
+
+
+class Command(BaseCommand):
+    help = "Attribue une semaine aux matchs qui n'en ont pas, ligue par ligue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--split", type=int, help="Split à planifier, le split actuel par défaut."
+        )
+        parser.add_argument("--league", type=int, help="Ligue à planifier.")
+        parser.add_argument(
+            "--double",
+            action="store_true",
+            help="Crée les matchs retour, les côtés inversés.",
+        )
+
+    def handle(self, *args, **options):
+        split = options["split"] or current_split()
+        leagues = [options["league"]]
+        if options["league"] is None:
+            leagues = (
+                Team.objects.filter(split=split)
+                .order_by("league")
+                .values_list("league", flat=True)
+                .distinct()
+            )
+
+        for league in leagues:
+            start = time.perf_counter()
+            created, scheduled = schedule(league, split, options["double"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Ligue {league} : {created} matchs créés, {scheduled} matchs "
+                    f"planifiés en {(time.perf_counter() - start) * 1000:.0f} ms."
+                )
+            )
@@ -0,0 +1,22 @@
+from django.urls import reverse
+
+from results.stats import deferred_stats
+
+
+class DeferredStatsMiddleware:
+    """
+    Middleware that defers the updates of the statistics during admin POST requests.
+
+    Every match, statistics row or team saved by the request only records the
+    players and teams it affects, and their counters are recomputed once when the
+    request's transaction is committed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method == "POST" and request.path.startswith(reverse("admin:index")):
+            with deferred_stats():
+                return self.get_response(request)
+        return self.get_response(request)
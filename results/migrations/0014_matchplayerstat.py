@@ -0,0 +1,37 @@
+# Generated by Django 3.2.8 on 2026-10-18 06:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0015_alter_player_name'),
+        ('results', '0013_match_split'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchPlayerStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('A', 'Team A'), ('B', 'Team B')], max_length=1)),
+                ('slot', models.IntegerField()),
+                ('score', models.IntegerField(default=0)),
+                ('goals', models.IntegerField(default=0)),
+                ('assists', models.IntegerField(default=0)),
+                ('saves', models.IntegerField(default=0)),
+                ('shots', models.IntegerField(default=0)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='player_stats', to='results.match')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_stats', to='teams.player')),
+            ],
+            options={
+                'ordering': ('side', 'slot'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='matchplayerstat',
+            constraint=models.UniqueConstraint(fields=('match', 'side', 'slot'), name='unique_match_player_slot'),
+        ),
+    ]
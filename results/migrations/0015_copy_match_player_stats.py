@@ -0,0 +1,65 @@
+from django.db import migrations
+
+
+STATS = ("score", "goals", "assists", "saves", "shots")
+SIDES = ("A", "B")
+SLOTS = range(1, 6)
+
+
+def copy_to_rows(apps, schema_editor):
+    """
+    Creates one MatchPlayerStat row per player slot filled in a match.
+    """
+
+    Match = apps.get_model("results", "Match")
+    MatchPlayerStat = apps.get_model("results", "MatchPlayerStat")
+
+    rows = []
+    for match in Match.objects.iterator():
+        for side in SIDES:
+            for slot in SLOTS:
+                field = f"team_{side}_player_{slot}"
+                player_id = getattr(match, f"{field}_id")
+                if player_id is None:
+                    continue
+                rows.append(
+                    MatchPlayerStat(
+                        match_id=match.id,
+                        player_id=player_id,
+                        side=side,
+                        slot=slot,
+                        **{stat: getattr(match, f"{field}_{stat}") for stat in STATS},
+                    )
+                )
+    MatchPlayerStat.objects.bulk_create(rows, batch_size=500)
+
+
+def copy_to_columns(apps, schema_editor):
+    """
+    Writes the MatchPlayerStat rows back into the player columns of the matches.
+    """
+
+    Match = apps.get_model("results", "Match")
+    MatchPlayerStat = apps.get_model("results", "MatchPlayerStat")
+
+    matches = {}
+    for row in MatchPlayerStat.objects.iterator():
+        values = matches.setdefault(row.match_id, {})
+        field = f"team_{row.side}_player_{row.slot}"
+        values[f"{field}_id"] = row.player_id
+        for stat in STATS:
+            values[f"{field}_{stat}"] = getattr(row, stat)
+
+    for match_id, values in matches.items():
+        Match.objects.filter(id=match_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("results", "0014_matchplayerstat"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_to_rows, copy_to_columns),
+    ]
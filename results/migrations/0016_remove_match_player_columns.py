@@ -0,0 +1,253 @@
+# Generated by Django 3.2.8 on 2026-10-18 06:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0015_copy_match_player_stats'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_1',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_1_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_1_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_1_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_1_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_1_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_2',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_2_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_2_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_2_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_2_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_2_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_3',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_3_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_3_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_3_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_3_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_3_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_4',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_4_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_4_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_4_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_4_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_4_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_5',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_5_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_5_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_5_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_5_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_A_player_5_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_1',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_1_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_1_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_1_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_1_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_1_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_2',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_2_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_2_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_2_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_2_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_2_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_3',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_3_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_3_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_3_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_3_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_3_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_4',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_4_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_4_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_4_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_4_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_4_shots',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_5',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_5_assists',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_5_goals',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_5_saves',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_5_score',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='team_B_player_5_shots',
+        ),
+    ]
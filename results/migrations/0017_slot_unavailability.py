@@ -0,0 +1,47 @@
+# Generated by Django 3.2.8 on 2026-10-18 06:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0018_remove_team_players'),
+        ('results', '0016_remove_match_player_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Slot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField(blank=True, null=True)),
+                ('capacity', models.IntegerField(default=1)),
+            ],
+            options={
+                'ordering': ('date', 'time'),
+            },
+        ),
+        migrations.CreateModel(
+            name='Unavailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unavailabilities', to='teams.team')),
+            ],
+            options={
+                'ordering': ('date',),
+            },
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='matches', to='results.slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='unavailability',
+            constraint=models.UniqueConstraint(fields=('team', 'date'), name='unique_team_unavailability'),
+        ),
+    ]
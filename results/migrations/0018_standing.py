@@ -0,0 +1,56 @@
+# Generated by Django 3.2.8 on 2026-10-18 06:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("teams", "0018_remove_team_players"),
+        ("results", "0017_slot_unavailability"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Standing",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("split", models.IntegerField()),
+                ("league", models.IntegerField()),
+                ("position", models.IntegerField()),
+                ("zone", models.CharField(blank=True, max_length=20)),
+                ("matches_played", models.IntegerField(default=0)),
+                ("wins", models.IntegerField(default=0)),
+                ("lose", models.IntegerField(default=0)),
+                ("bo_diff", models.IntegerField(default=0)),
+                ("bo_wins", models.IntegerField(default=0)),
+                ("bo_lose", models.IntegerField(default=0)),
+                (
+                    "team",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standing",
+                        to="teams.team",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("split", "league", "position"),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="standing",
+            constraint=models.UniqueConstraint(
+                fields=("split", "league", "position"), name="unique_standing_position"
+            ),
+        ),
+    ]
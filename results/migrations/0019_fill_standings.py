@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# Frozen copies of the ranking rules at the time of this migration, so that later
+# changes to results.standings do not change what it does
+ZONES = {
+    1: ((6, 6, "table-warning"), (7, None, "table-danger")),
+    2: ((1, 2, "table-success"), (5, 5, "table-warning"), (6, None, "table-danger")),
+    3: ((1, 2, "table-success"), (6, 6, "table-warning"), (7, None, "table-danger")),
+    4: ((1, 3, "table-warning"),),
+}
+
+COUNTERS = ("matches_played", "wins", "lose", "bo_diff", "bo_wins", "bo_lose")
+
+
+def zone(league, position):
+    for first, last, css_class in ZONES.get(league, ()):
+        if first <= position and (last is None or position <= last):
+            return css_class
+    return ""
+
+
+def rank(teams):
+    return sorted(
+        teams,
+        key=lambda team: (
+            -team.wins,
+            team.lose,
+            -team.bo_diff,
+            -team.bo_wins,
+            team.bo_lose,
+            team.id,
+        ),
+    )
+
+
+def fill_standings(apps, schema_editor):
+    """
+    Ranks every league of every split from the counters of the teams.
+    """
+
+    Team = apps.get_model("teams", "Team")
+    Standing = apps.get_model("results", "Standing")
+
+    leagues = {}
+    for team in Team.objects.iterator():
+        leagues.setdefault((team.split, team.league), []).append(team)
+
+    Standing.objects.bulk_create(
+        [
+            Standing(
+                team_id=team.id,
+                split=split,
+                league=league,
+                position=position,
+                zone=zone(league, position),
+                **{counter: getattr(team, counter) for counter in COUNTERS},
+            )
+            for (split, league), teams in leagues.items()
+            for position, team in enumerate(rank(teams), 1)
+        ],
+        batch_size=500,
+    )
+
+
+def empty_standings(apps, schema_editor):
+    apps.get_model("results", "Standing").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("results", "0018_standing"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_standings, empty_standings),
+    ]
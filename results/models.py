@@ -1,11 +1,63 @@
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from teams.models import *
 from results.calendars import *
+from results import stats
+from results.standings import refresh_standings
+from interligue.tracking import FieldTracker
+from interligue import pages
+from configuration.models import Configuration
 
+# Fields of a team that its matches depend on
+SCHEDULE_FIELDS = ("league", "split")
 
-class Match(models.Model):
+# Matches whose result has not been entered yet
+UNPLAYED = Q(team_A_score=0, team_B_score=0)
+
+# Fields of a membership that the statistics rows of the matches depend on
+MEMBERSHIP_FIELDS = ("team_id", "player_id", "slot", "left")
+
+
+class Slot(models.Model):
+    date = models.DateField(null=False, blank=False)
+    time = models.TimeField(null=True, blank=True)
+    # Number of matches that can be cast or streamed at the same time
+    capacity = models.IntegerField(default=1, null=False, blank=False)
+
+    class Meta:
+        ordering = ("date", "time")
+
+    def __str__(self):
+        if self.time is None:
+            return f"{self.date:%d/%m/%Y}"
+        return f"{self.date:%d/%m/%Y} {self.time:%H:%M}"
+
+
+class Unavailability(models.Model):
+    team = models.ForeignKey(
+        Team,
+        related_name="unavailabilities",
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+    )
+    date = models.DateField(null=False, blank=False)
+
+    class Meta:
+        ordering = ("date",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=("team", "date"), name="unique_team_unavailability"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.team} - {self.date:%d/%m/%Y}"
+
+
+class Match(FieldTracker, models.Model):
     league = models.IntegerField(default=1, null=False, blank=False)
     date = models.DateField(null=True, blank=True)
     week = models.IntegerField(null=True, blank=True)
@@ -18,136 +70,13 @@ class Match(models.Model):
     )
     team_A_score = models.IntegerField(default=0, null=False, blank=False)
     team_B_score = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_1 = models.ForeignKey(
-        Player,
-        related_name="team_A_player_1",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    team_A_player_2 = models.ForeignKey(
-        Player,
-        related_name="team_A_player_2",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    team_A_player_3 = models.ForeignKey(
-        Player,
-        related_name="team_A_player_3",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    team_A_player_4 = models.ForeignKey(
-        Player,
-        related_name="team_A_player_4",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    team_A_player_5 = models.ForeignKey(
-        Player,
-        related_name="team_A_player_5",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    team_B_player_1 = models.ForeignKey(
-        Player,
-        related_name="team_B_player_1",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    team_B_player_2 = models.ForeignKey(
-        Player,
-        related_name="team_B_player_2",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    team_B_player_3 = models.ForeignKey(
-        Player,
-        related_name="team_B_player_3",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    team_B_player_4 = models.ForeignKey(
-        Player,
-        related_name="team_B_player_4",
-        on_delete=models.CASCADE,
+    slot = models.ForeignKey(
+        Slot,
+        related_name="matches",
+        on_delete=models.SET_NULL,
         null=True,
         blank=True,
     )
-    team_B_player_5 = models.ForeignKey(
-        Player,
-        related_name="team_B_player_5",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-
-    team_A_player_1_score = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_1_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_1_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_1_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_1_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_A_player_2_score = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_2_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_2_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_2_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_2_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_A_player_3_score = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_3_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_3_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_3_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_3_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_A_player_4_score = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_4_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_4_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_4_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_4_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_A_player_5_score = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_5_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_5_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_5_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_A_player_5_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_B_player_1_score = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_1_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_1_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_1_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_1_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_B_player_2_score = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_2_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_2_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_2_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_2_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_B_player_3_score = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_3_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_3_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_3_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_3_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_B_player_4_score = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_4_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_4_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_4_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_4_shots = models.IntegerField(default=0, null=False, blank=False)
-
-    team_B_player_5_score = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_5_goals = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_5_assists = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_5_saves = models.IntegerField(default=0, null=False, blank=False)
-    team_B_player_5_shots = models.IntegerField(default=0, null=False, blank=False)
 
     def get_team_win(self):
         """
@@ -177,161 +106,423 @@ class Match(models.Model):
         else:
             return True
 
-    def calculate_player_stats(sender, instance, **kwargs):
+    @staticmethod
+    def create_matches(instance):
         """
-        Update the statistics of players involved in a match
+        Create matches for a newly created team or one that has changed leagues.
+
+        Only the league of the team is affected: the pairings that already exist are
+        fetched at once and the missing ones are created in bulk.
 
         Args:
-            sender (Model): The model class of the sender.
-            instance (Model): The actual instance being saved.
-            **kwargs (dict): Optional keyword arguments.
+            instance (Team): The team whose league needs its matches.
         """
 
-        # Loop over the fields corresponding to each team in the match
-        for teams in [
-            "team_A",
-            "team_B",
-        ]:
-            # Loop over the fields corresponding to each player in the team
-            for players in [
-                "player_1",
-                "player_2",
-                "player_3",
-                "player_4",
-                "player_5",
-            ]:
-                player_field = f"{teams}_{players}"
-                # Get the Player object corresponding to the current player field
-                player = getattr(instance, player_field)
-                if player is not None:
-                    Player.set_statistics(player.id)
-            team = getattr(instance, teams)
-            Team.set_statistics(team)
-            Team.set_teams_stats(team)
-
-    @receiver(post_save, sender=Team)
-    def create_matches(sender, **kwargs):
+        matches = Match.objects.filter(split=instance.split, league=instance.league)
+
+        # Get the pairings that already have a match, whichever team is team A
+        existing = {
+            frozenset(pair) for pair in matches.values_list("team_A_id", "team_B_id")
+        }
+
+        # Create a match for every pairing of the league that has none yet
+        match_objs = [
+            Match(
+                split=team_a.split,
+                league=team_a.league,
+                team_A=team_a,
+                team_B=team_b,
+            )
+            for team_a, team_b in calendar(instance.league, instance.split)
+            if frozenset((team_a.id, team_b.id)) not in existing
+        ]
+        if not match_objs:
+            return
+        Match.objects.bulk_create(match_objs)
+
+        # Create the statistics rows of the players of the new matches
+        MatchPlayerStat.create_for_matches(matches.filter(player_stats__isnull=True))
+
+    @staticmethod
+    def update_matches(instance):
         """
-        Create matches for a newly created team or one that has changed leagues.
+        Update the player information for the matches of a team that are not played yet.
+
+        Played matches are locked: they keep the players who played them, so that
+        past statistics stay with them. The rows of the team's side in the other
+        matches are compared with its roster in memory, the changes are written in
+        bulk without going through the per-row signals, and the statistics those
+        rows carry are moved from player to player with one atomic update.
 
         Args:
-            sender (Model): The model class of the sender.
-            **kwargs: Optional keyword arguments.
+            instance (Team): The team whose roster has changed.
         """
 
-        match_objs = []
-        # Get a list of all unique leagues
-        for league in Team.objects.values_list("league", flat=True).distinct():
-            # Get a list of matches between teams in the league
-            matches = calendar(league)
-            for team_a, team_b in matches:
-                # Check if a match already exists with these teams
-                if (
-                    not Match.objects.filter(team_A=team_a, team_B=team_b).exists()
-                    and team_a.split == team_b.split
-                ):
-                    # Create a new match object
-                    match_objs.append(
-                        Match(
-                            split=team_a.split,
-                            league=team_a.league,
-                            team_A=team_a,
-                            team_B=team_b,
-                            team_A_player_1=team_a.player1,
-                            team_A_player_2=team_a.player2,
-                            team_A_player_3=team_a.player3,
-                            team_A_player_4=team_a.player4,
-                            team_A_player_5=team_a.player5,
-                            team_B_player_1=team_b.player1,
-                            team_B_player_2=team_b.player2,
-                            team_B_player_3=team_b.player3,
-                            team_B_player_4=team_b.player4,
-                            team_B_player_5=team_b.player5,
-                        )
-                    )
-        # Create all the new match objects in bulk
-        Match.objects.bulk_create(match_objs)
-
-    @receiver(post_save, sender=Team)
-    def update_matches(sender, instance, **kwargs):
+        roster = dict.fromkeys(range(1, 6))
+        roster.update(instance.get_roster())
+
+        # Get the side the team plays on in each of its unplayed matches
+        sides = {
+            match_id: "A" if team_a_id == instance.id else "B"
+            for match_id, team_a_id in (
+                Match.objects.filter(Q(team_A=instance) | Q(team_B=instance))
+                .filter(UNPLAYED)
+                .values_list("id", "team_A_id")
+            )
+        }
+        if not sides:
+            return
+
+        # Compare the team's rows with its roster
+        rows = (
+            MatchPlayerStat.objects.filter(
+                Q(side="A", match__team_A=instance)
+                | Q(side="B", match__team_B=instance)
+            )
+            .filter(match__in=sides)
+            .only("id", "match_id", "side", "slot", "player_id", *STATS)
+        )
+        changed, removed, old, new = [], [], [], []
+        missing = {(match_id, slot) for match_id in sides for slot in roster}
+        for row in rows:
+            missing.discard((row.match_id, row.slot))
+            player_id = roster.get(row.slot)
+            if player_id == row.player_id:
+                continue
+            values = {stat: getattr(row, stat) for stat in STATS}
+            old.append({**values, "player_id": row.player_id, "team_id": instance.id})
+            if player_id is None:
+                removed.append(row.id)
+            else:
+                row.player_id = player_id
+                changed.append(row)
+                new.append({**values, "player_id": player_id, "team_id": instance.id})
+
+        created = [
+            MatchPlayerStat(
+                match_id=match_id,
+                player_id=roster[slot],
+                side=sides[match_id],
+                slot=slot,
+            )
+            for match_id, slot in missing
+            if roster[slot] is not None
+        ]
+        if not (changed or removed or created):
+            return
+
+        with transaction.atomic(), stats.removed(rows=removed):
+            MatchPlayerStat.objects.bulk_update(changed, ["player"])
+            MatchPlayerStat.objects.filter(id__in=removed).delete()
+            MatchPlayerStat.objects.bulk_create(created)
+
+            # Move what the rows carry from the players who left to those who joined
+            stats.apply_rows_delta(old, new)
+
+    @staticmethod
+    def delete_matches(instance):
         """
-        Update the player information for all matches involving a team when a team is updated.
+        Delete all matches involving a team when it has changed leagues or splits.
+
+        What the matches added to the counters of the players and teams is
+        subtracted in a few grouped statements before they are deleted at once.
 
         Args:
-            sender (Model): The model class of the sender.
-            instance (Model): The actual instance being saved.
-            **kwargs: Optional keyword arguments.
+            instance (Team): The team that has changed leagues or splits.
         """
 
-        # Update all matches involving the updated team
-        for match in Match.objects.filter(team_A=instance) | Match.objects.filter(
-            team_B=instance
-        ):
-            # Update the player information for the updated team
-            match.team_A_player_1 = match.team_A.player1
-            match.team_A_player_2 = match.team_A.player2
-            match.team_A_player_3 = match.team_A.player3
-            match.team_A_player_4 = match.team_A.player4
-            match.team_A_player_5 = match.team_A.player5
-            match.team_B_player_1 = match.team_B.player1
-            match.team_B_player_2 = match.team_B.player2
-            match.team_B_player_3 = match.team_B.player3
-            match.team_B_player_4 = match.team_B.player4
-            match.team_B_player_5 = match.team_B.player5
-            match.save()
-
-    @receiver(post_save, sender=Team)
-    def delete_matches(sender, instance, **kwargs):
+        # Find the matches of the team that are not in its league anymore
+        matches = Match.objects.filter(Q(team_A=instance) | Q(team_B=instance)).exclude(
+            league=instance.league, split=instance.split
+        )
+
+        ids = list(matches.values_list("id", flat=True))
+        matches = Match.objects.filter(pk__in=ids)
+
+        with transaction.atomic(), stats.removed(ids):
+            # Remove the statistics of the matches from their players and teams
+            stats.reverse_matches(matches)
+            matches.delete()
+
+
+class MatchPlayerStat(FieldTracker, models.Model):
+    SIDES = (
+        ("A", "Team A"),
+        ("B", "Team B"),
+    )
+
+    match = models.ForeignKey(
+        Match,
+        related_name="player_stats",
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+    )
+    player = models.ForeignKey(
+        Player,
+        related_name="match_stats",
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+    )
+    side = models.CharField(max_length=1, choices=SIDES, null=False, blank=False)
+    slot = models.IntegerField(null=False, blank=False)
+    score = models.IntegerField(default=0, null=False, blank=False)
+    goals = models.IntegerField(default=0, null=False, blank=False)
+    assists = models.IntegerField(default=0, null=False, blank=False)
+    saves = models.IntegerField(default=0, null=False, blank=False)
+    shots = models.IntegerField(default=0, null=False, blank=False)
+
+    class Meta:
+        ordering = ("side", "slot")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("match", "side", "slot"), name="unique_match_player_slot"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.match} - {self.player}"
+
+    @staticmethod
+    def create_for_matches(matches):
         """
-        Delete all matches involving a team when it is deleted or has changed leagues.
+        Creates the statistics rows of the players of several matches.
 
         Args:
-            sender (Model): The model class of the sender.
-            instance (Model): The actual instance being saved.
-            **kwargs: Optional keyword arguments.
+            matches (QuerySet): The matches.
         """
 
-        # Find all matches that involve the deleted team
-        for match in Match.objects.filter(team_A=instance) | Match.objects.filter(
-            team_B=instance
-        ):
-            if match.league != instance.league:
-                # Loop over the fields corresponding to each player in the match
-                for player_field in [
-                    "team_A_player_1",
-                    "team_A_player_2",
-                    "team_A_player_3",
-                    "team_A_player_4",
-                    "team_A_player_5",
-                    "team_B_player_1",
-                    "team_B_player_2",
-                    "team_B_player_3",
-                    "team_B_player_4",
-                    "team_B_player_5",
-                ]:
-                    # Get the Player object corresponding to the current player field
-                    player = getattr(match, player_field)
-                    if player is not None:
-                        player = Player.objects.select_related().get(id=player.id)
-                        # Copy the player's current statistics into a dictionary
-                        player_stats = {
-                            "score": player.score,
-                            "goals": player.goals,
-                            "assists": player.assists,
-                            "saves": player.saves,
-                            "shots": player.shots,
-                        }
-                        # Loop over the statistics and update the player's stats
-                        for stat in player_stats:
-                            field_name = f"{player_field}_{stat}"
-                            player_stats[stat] += -getattr(match, field_name)
-
-                        # Update the player's statistics in the database
-                        Player.objects.update_or_create(
-                            id=player.id,
-                            defaults=player_stats,
-                        )
-                match.delete()
+        matches = list(matches.values_list("id", "team_A_id", "team_B_id"))
+
+        # Get the current roster of every team of the matches at once
+        rosters = {}
+        for team_id, slot, player_id in TeamMembership.objects.filter(
+            team__in={team_id for match in matches for team_id in match[1:]},
+            left__isnull=True,
+        ).values_list("team_id", "slot", "player_id"):
+            rosters.setdefault(team_id, {})[slot] = player_id
+
+        rows = [
+            MatchPlayerStat(
+                match_id=match_id, player_id=player_id, side=side, slot=slot
+            )
+            for match_id, team_a_id, team_b_id in matches
+            for side, team_id in (("A", team_a_id), ("B", team_b_id))
+            for slot, player_id in rosters.get(team_id, {}).items()
+        ]
+        MatchPlayerStat.objects.bulk_create(rows)
+
+
+class Standing(models.Model):
+    """
+    Position of a team in the standings of its league, kept up to date with the
+    results so that the standings are read already ranked.
+    """
+
+    team = models.OneToOneField(
+        Team,
+        related_name="standing",
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+    )
+    split = models.IntegerField(null=False, blank=False)
+    league = models.IntegerField(null=False, blank=False)
+    position = models.IntegerField(null=False, blank=False)
+    zone = models.CharField(max_length=20, blank=True)
+
+    matches_played = models.IntegerField(default=0, null=False, blank=False)
+    wins = models.IntegerField(default=0, null=False, blank=False)
+    lose = models.IntegerField(default=0, null=False, blank=False)
+    bo_diff = models.IntegerField(default=0, null=False, blank=False)
+    bo_wins = models.IntegerField(default=0, null=False, blank=False)
+    bo_lose = models.IntegerField(default=0, null=False, blank=False)
+
+    class Meta:
+        ordering = ("split", "league", "position")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("split", "league", "position"), name="unique_standing_position"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.position}. {self.team}"
+
+
+@receiver(pre_save, sender=Team)
+def team_pre_save(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called before a Team object is saved.
+
+    Keeps the league and split stored in the database so that the matches are only
+    touched when one of them changes.
+
+    Args:
+        sender: The model class that is sending the signal (Team).
+        instance: The actual instance of the Team model that is about to be saved.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    if not instance.writes(kwargs.get("update_fields"), SCHEDULE_FIELDS):
+        instance._schedule_snapshot = {
+            field: getattr(instance, field) for field in SCHEDULE_FIELDS
+        }
+    elif instance.pk is None:
+        instance._schedule_snapshot = None
+    else:
+        instance._schedule_snapshot = (
+            Team.objects.filter(pk=instance.pk).values(*SCHEDULE_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Team)
+def team_post_save(sender, instance, created, **kwargs):
+    """
+    Signal receiver function that is called whenever a Team object is saved.
+
+    Reconciles the matches of the team with what changed: a new team or a change of
+    league or split replaces its pairings, and any other change leaves the matches
+    untouched.
+
+    Args:
+        sender: The model class that is sending the signal (Team).
+        instance: The actual instance of the Team model that was saved.
+        created: Whether the team was created by this save.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    old = getattr(instance, "_schedule_snapshot", None)
+    new = {field: getattr(instance, field) for field in SCHEDULE_FIELDS}
+    instance._schedule_snapshot = new
+    if old == new:
+        return
+
+    with transaction.atomic():
+        if created or old is None:
+            Match.create_matches(instance)
+        else:
+            Match.delete_matches(instance)
+            Match.create_matches(instance)
+
+        # The team leaves the standings of its previous league for the new one
+        groups = [(instance.split, instance.league)]
+        if old is not None:
+            groups.append((old["split"], old["league"]))
+        refresh_standings(groups=groups)
+
+
+@receiver(post_delete, sender=Team)
+def team_post_delete(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called whenever a Team object is deleted.
+
+    Ranks the other teams of its league again.
+
+    Args:
+        sender: The model class that is sending the signal (Team).
+        instance: The actual instance of the Team model that was deleted.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    refresh_standings(groups=[(instance.split, instance.league)])
+
+
+@receiver(pre_save, sender=TeamMembership)
+def team_membership_pre_save(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called before a TeamMembership object is saved.
+
+    Keeps the team, player and slot stored in the database so that the matches are
+    only updated when the roster actually changes.
+
+    Args:
+        sender: The model class that is sending the signal (TeamMembership).
+        instance: The actual instance of the TeamMembership model that is about to be saved.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    if not instance.writes(kwargs.get("update_fields"), MEMBERSHIP_FIELDS):
+        instance._roster_snapshot = {
+            field: getattr(instance, field) for field in MEMBERSHIP_FIELDS
+        }
+    elif instance.pk is None:
+        instance._roster_snapshot = None
+    else:
+        instance._roster_snapshot = (
+            TeamMembership.objects.filter(pk=instance.pk)
+            .values(*MEMBERSHIP_FIELDS)
+            .first()
+        )
+
+
+@receiver(post_save, sender=TeamMembership)
+def team_membership_post_save(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called whenever a TeamMembership object is saved.
+
+    Propagates the change of roster to the matches of the teams it affects.
+
+    Args:
+        sender: The model class that is sending the signal (TeamMembership).
+        instance: The actual instance of the TeamMembership model that was saved.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    old = getattr(instance, "_roster_snapshot", None)
+    new = {field: getattr(instance, field) for field in MEMBERSHIP_FIELDS}
+    instance._roster_snapshot = new
+    if old == new:
+        return
+
+    team_ids = {new["team_id"]} | ({old["team_id"]} if old else set())
+    with transaction.atomic():
+        for team in Team.objects.filter(pk__in=team_ids):
+            Match.update_matches(team)
+
+
+@receiver(post_delete, sender=TeamMembership)
+def team_membership_post_delete(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called whenever a TeamMembership object is deleted.
+
+    Removes the player from the matches of the team, unless the team itself is
+    being deleted, inside `teams.models.deleting`.
+
+    Args:
+        sender: The model class that is sending the signal (TeamMembership).
+        instance: The actual instance of the TeamMembership model that was deleted.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    if instance.left is not None or is_deleting(instance.team_id):
+        return
+    team = Team.objects.filter(pk=instance.team_id).first()
+    if team is not None:
+        Match.update_matches(team)
+
+
+@receiver(pre_save, sender=Match)
+def match_pre_save(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called before a Match object is saved.
+
+    Keeps the values stored in the database so that the statistics can be updated
+    with the difference once the match is saved.
+
+    Args:
+        sender: The model class that is sending the signal (Match).
+        instance: The actual instance of the Match model that is about to be saved.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    # Saves limited to other fields cost nothing more
+    instance._stats_changed = instance.writes(
+        kwargs.get("update_fields"), stats.MATCH_FIELDS
+    )
+    if instance._stats_changed:
+        instance._stats_snapshot = stats.load_match_snapshot(instance)
 
 
 @receiver(post_save, sender=Match)
@@ -345,4 +536,144 @@ def match_post_save(sender, instance, **kwargs):
         **kwargs: Additional keyword arguments passed to the signal receiver.
     """
 
-    Match.calculate_player_stats(sender, instance, **kwargs)
+    # Rescheduling a match does not change any statistic
+    if not getattr(instance, "_stats_changed", True):
+        return
+    old = getattr(instance, "_stats_snapshot", None)
+    new = stats.match_snapshot(instance)
+    if old != new:
+        stats.apply_match_delta(old, new)
+
+
+@receiver(pre_delete, sender=Match)
+def match_pre_delete(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called before a Match object is deleted.
+
+    Keeps the values stored in the database, unless the code deleting the match
+    has already removed what it added to the counters.
+
+    Args:
+        sender: The model class that is sending the signal (Match).
+        instance: The actual instance of the Match model that is about to be deleted.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    if stats.is_removed(match_id=instance.pk):
+        instance._stats_snapshot = None
+    else:
+        instance._stats_snapshot = stats.load_match_snapshot(instance)
+
+
+@receiver(post_delete, sender=Match)
+def match_post_delete(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called whenever a Match object is deleted.
+
+    Removes the result of the match from its teams and ranks their league again,
+    without it. Its statistics rows, deleted before it, are removed by their own
+    receivers.
+
+    Args:
+        sender: The model class that is sending the signal (Match).
+        instance: The actual instance of the Match model that was deleted.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    old = getattr(instance, "_stats_snapshot", None)
+    if old is not None:
+        stats.apply_match_delta(old, None)
+
+
+@receiver(pre_save, sender=MatchPlayerStat)
+def match_player_stat_pre_save(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called before a MatchPlayerStat object is saved.
+
+    Args:
+        sender: The model class that is sending the signal (MatchPlayerStat).
+        instance: The actual instance of the MatchPlayerStat model that is about to be saved.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    # Saves limited to other fields cost nothing more
+    instance._stats_changed = instance.writes(
+        kwargs.get("update_fields"), stats.ROW_FIELDS
+    )
+    if instance._stats_changed:
+        instance._stats_snapshot = stats.load_row_snapshot(instance)
+
+
+@receiver(post_save, sender=MatchPlayerStat)
+def match_player_stat_post_save(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called whenever a MatchPlayerStat object is saved.
+
+    Args:
+        sender: The model class that is sending the signal (MatchPlayerStat).
+        instance: The actual instance of the MatchPlayerStat model that was saved.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    if not getattr(instance, "_stats_changed", True):
+        return
+    old = getattr(instance, "_stats_snapshot", None)
+    new = stats.row_snapshot(instance, old)
+    if old != new:
+        stats.apply_row_delta(old, new)
+
+
+@receiver(pre_delete, sender=MatchPlayerStat)
+def match_player_stat_pre_delete(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called before a MatchPlayerStat object is deleted.
+
+    Keeps the values stored in the database, unless the code deleting the row has
+    already removed what it added to the counters.
+
+    Args:
+        sender: The model class that is sending the signal (MatchPlayerStat).
+        instance: The actual instance of the MatchPlayerStat model that is about to be deleted.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    if stats.is_removed(match_id=instance.match_id, row_id=instance.pk):
+        instance._stats_snapshot = None
+    else:
+        instance._stats_snapshot = stats.load_row_snapshot(instance)
+
+
+@receiver(post_delete, sender=MatchPlayerStat)
+def match_player_stat_post_delete(sender, instance, **kwargs):
+    """
+    Signal receiver function that is called whenever a MatchPlayerStat object is deleted.
+
+    Removes the statistics of the row from its player and its team.
+
+    Args:
+        sender: The model class that is sending the signal (MatchPlayerStat).
+        instance: The actual instance of the MatchPlayerStat model that was deleted.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    old = getattr(instance, "_stats_snapshot", None)
+    if old is not None:
+        stats.apply_row_delta(old, None)
+
+
+@receiver([post_save, post_delete], sender=Match)
+@receiver([post_save, post_delete], sender=MatchPlayerStat)
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Player)
+@receiver([post_save, post_delete], sender=TeamMembership)
+@receiver([post_save, post_delete], sender=Configuration)
+def public_data_changed(sender, **kwargs):
+    """
+    Signal receiver function that is called whenever data shown on the public pages is saved or deleted.
+
+    Args:
+        sender: The model class that is sending the signal.
+        **kwargs: Additional keyword arguments passed to the signal receiver.
+    """
+
+    pages.invalidate()
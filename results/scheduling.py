@@ -0,0 +1,207 @@
+import time
+
+from django.db.models import Count, F, Q
+
+from interligue import pages
+
+
+def solve(matches, slots, unavailable=None, busy=None):
+    """
+    Places matches into time slots.
+
+    Every date is a bit of the bitsets of the teams, so that the dates where two
+    teams can meet are found with a few integer operations. Matches are placed
+    greedily on the first date that suits both teams and still has a free slot. A
+    match that fits nowhere is then given a date taken by a single other match,
+    which is moved to another date if it can be. Matches that still do not fit are
+    placed where they break the fewest constraints.
+
+    Args:
+        matches (list): The matches as (key, team A id, team B id) tuples, in the
+            order they should be placed.
+        slots (list): The slots as (key, date, capacity) tuples, the capacity
+            being the number of matches the slot can still hold.
+        unavailable (dict): The dates each team cannot play, keyed by team id.
+        busy (dict): The dates each team already plays, keyed by team id.
+
+    Returns:
+        tuple: The slot key of each match keyed by match key, and the number of
+        constraints that could not be met.
+    """
+
+    days = sorted({date for key, date, capacity in slots})
+    bits = {date: bit for bit, date in enumerate(days)}
+    every_day = (1 << len(days)) - 1
+
+    # Remaining capacity of the slots of each date
+    free = [[] for day in days]
+    for key, date, capacity in slots:
+        free[bits[date]].append([key, capacity])
+
+    def bitset(dates):
+        return sum(1 << bits[date] for date in set(dates) if date in bits)
+
+    blocked = {team: bitset(dates) for team, dates in (unavailable or {}).items()}
+    taken = {team: bitset(dates) for team, dates in (busy or {}).items()}
+    full = sum(1 << bit for bit, day in enumerate(free) if all(c <= 0 for k, c in day))
+    placed = {}
+    on_day = [[] for day in days]
+
+    def options(team_a, team_b):
+        return every_day & ~(
+            blocked.get(team_a, 0)
+            | blocked.get(team_b, 0)
+            | taken.get(team_a, 0)
+            | taken.get(team_b, 0)
+            | full
+        )
+
+    def broken(bit, team_a, team_b):
+        # Number of constraints a match would break on a date
+        return sum(
+            bitsets.get(team, 0) >> bit & 1
+            for bitsets in (blocked, taken)
+            for team in (team_a, team_b)
+        ) + (full >> bit & 1)
+
+    def place(match, bit):
+        nonlocal full
+        key, team_a, team_b = match
+        slot = max(free[bit], key=lambda slot: slot[1])
+        slot[1] -= 1
+        if all(capacity <= 0 for k, capacity in free[bit]):
+            full |= 1 << bit
+        taken[team_a] = taken.get(team_a, 0) | 1 << bit
+        taken[team_b] = taken.get(team_b, 0) | 1 << bit
+        placed[key] = (bit, slot)
+        on_day[bit].append(match)
+
+    def unplace(match):
+        nonlocal full
+        key, team_a, team_b = match
+        bit, slot = placed.pop(key)
+        slot[1] += 1
+        full &= ~(1 << bit)
+        taken[team_a] &= ~(1 << bit)
+        taken[team_b] &= ~(1 << bit)
+        on_day[bit].remove(match)
+
+    # Greedy pass: the first date that suits both teams
+    unplaced = []
+    for match in matches:
+        available = options(match[1], match[2])
+        if available:
+            place(match, (available & -available).bit_length() - 1)
+        else:
+            unplaced.append(match)
+
+    # Repair pass: free a date by moving the one match in the way
+    remaining = []
+    for match in unplaced:
+        key, team_a, team_b = match
+        allowed = every_day & ~(blocked.get(team_a, 0) | blocked.get(team_b, 0))
+        repaired = False
+        for bit in range(len(days)):
+            if not allowed >> bit & 1:
+                continue
+            in_the_way = [
+                other for other in on_day[bit] if {team_a, team_b} & set(other[1:])
+            ]
+            if not in_the_way and full >> bit & 1:
+                in_the_way = on_day[bit][:1]
+            if len(in_the_way) != 1:
+                continue
+            other = in_the_way[0]
+            unplace(other)
+            elsewhere = options(other[1], other[2]) & ~(1 << bit)
+            if elsewhere and options(team_a, team_b) >> bit & 1:
+                place(match, bit)
+                place(other, (elsewhere & -elsewhere).bit_length() - 1)
+                repaired = True
+                break
+            place(other, bit)
+        if not repaired:
+            remaining.append(match)
+
+    # Last resort: the date that breaks the fewest constraints
+    violations = 0
+    for match in remaining:
+        key, team_a, team_b = match
+        if not days:
+            violations += 1
+            continue
+        bit = min(range(len(days)), key=lambda bit: broken(bit, team_a, team_b))
+        violations += broken(bit, team_a, team_b)
+        place(match, bit)
+
+    return {key: slot[0] for key, (bit, slot) in placed.items()}, violations
+
+
+def schedule_dates(matches):
+    """
+    Places matches into the time slots and writes their slot and date back.
+
+    The other matches of the teams and of the slots are taken into account, and
+    matches that are already played are left where they are.
+
+    Args:
+        matches (QuerySet): The matches to place.
+
+    Returns:
+        tuple: The number of matches placed, the number of constraints that could
+        not be met and the time taken by the solver, in seconds.
+    """
+
+    from results.models import Match, Slot, UNPLAYED, Unavailability
+
+    matches = list(
+        matches.filter(UNPLAYED)
+        .order_by(F("week").asc(nulls_last=True), "id")
+        .only("id", "week", "team_A_id", "team_B_id", "slot_id", "date")
+    )
+    if not matches:
+        return 0, 0, 0.0
+    ids = [match.id for match in matches]
+    teams = {team for match in matches for team in (match.team_A_id, match.team_B_id)}
+
+    # What the other matches already take of the slots and of the teams
+    slots = Slot.objects.annotate(
+        taken=Count("matches", filter=~Q(matches__id__in=ids))
+    ).values_list("id", "date", "capacity", "taken")
+    busy = {}
+    for team_a_id, team_b_id, date in (
+        Match.objects.filter(Q(team_A__in=teams) | Q(team_B__in=teams))
+        .exclude(id__in=ids)
+        .exclude(date__isnull=True)
+        .values_list("team_A_id", "team_B_id", "date")
+    ):
+        busy.setdefault(team_a_id, []).append(date)
+        busy.setdefault(team_b_id, []).append(date)
+    unavailable = {}
+    for team_id, date in Unavailability.objects.filter(team__in=teams).values_list(
+        "team_id", "date"
+    ):
+        unavailable.setdefault(team_id, []).append(date)
+
+    slots = {
+        slot_id: (slot_id, date, capacity - taken)
+        for slot_id, date, capacity, taken in slots
+    }
+    start = time.perf_counter()
+    placement, violations = solve(
+        [(match.id, match.team_A_id, match.team_B_id) for match in matches],
+        list(slots.values()),
+        unavailable,
+        busy,
+    )
+    elapsed = time.perf_counter() - start
+
+    # Matches left without a slot keep the date they had
+    placed = [match for match in matches if match.id in placement]
+    for match in placed:
+        match.slot_id = placement[match.id]
+        match.date = slots[match.slot_id][1]
+    Match.objects.bulk_update(placed, ["slot", "date"], batch_size=500)
+    if placed:
+        pages.invalidate()
+    return len(placed), violations, elapsed
@@ -0,0 +1,222 @@
+import csv
+import json
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import Q
+
+from interligue import pages
+from results import stats
+from teams.models import STATS, Player
+
+
+class ScoreSheetError(Exception):
+    """
+    Raised when a score sheet cannot be imported, with every problem found.
+    """
+
+    def __init__(self, errors):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def read_score_sheet(path):
+    """
+    Reads the lines of a score sheet.
+
+    The sheet has one line per player per match, in CSV or in JSON as a list of
+    objects, with the columns of the export: `match_id`, `side`, `player` (a name
+    or a tracker URL), `team_score`, `opponent_score` and the statistics, and
+    optionally `slot`.
+
+    Args:
+        path (str): The path of the file, ending with `.csv` or `.json`.
+
+    Returns:
+        list: The lines of the sheet, as dictionaries.
+    """
+
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8") as file:
+        if path.suffix.lower() == ".json":
+            return json.load(file)
+        return list(csv.DictReader(file))
+
+
+def import_results(lines, dry_run=False):
+    """
+    Enters the results of a score sheet.
+
+    The whole sheet is validated before anything is written. The matches and the
+    statistics rows are then written with one bulk update each and the counters
+    of the players and teams involved are recomputed once, in one transaction.
+
+    Args:
+        lines (list): The lines of the sheet, as read by `read_score_sheet`.
+        dry_run (bool): Only report the differences, without writing them.
+
+    Returns:
+        list: The differences between the sheet and the database, as sentences.
+
+    Raises:
+        ScoreSheetError: If the sheet does not match the matches or the players.
+    """
+
+    from results.models import Match, MatchPlayerStat
+
+    errors = []
+    lines = [_clean(number, line, errors) for number, line in enumerate(lines, 1)]
+    lines = [line for line in lines if line is not None]
+
+    matches = Match.objects.select_related("team_A", "team_B").in_bulk(
+        {line["match_id"] for line in lines}
+    )
+    rows = {}
+    for row in MatchPlayerStat.objects.filter(match__in=matches).select_related(
+        "player"
+    ):
+        rows.setdefault((row.match_id, row.side), []).append(row)
+    players = _find_players({line["player"] for line in lines})
+
+    # Scores of each match and new values of each row, as the sheet gives them
+    scores = {}
+    sheet = {}
+    for line in lines:
+        number, match = line["number"], matches.get(line["match_id"])
+        if match is None:
+            errors.append(f"Ligne {number} : le match {line['match_id']} n'existe pas.")
+            continue
+        score = (line["team_score"], line["opponent_score"])
+        if line["side"] == "B":
+            score = score[::-1]
+        if scores.setdefault(match.id, score) != score:
+            errors.append(f"Ligne {number} : le score du match {match.id} diffère.")
+
+        side_rows = rows.get((match.id, line["side"]), [])
+        row = next(
+            (
+                row
+                for row in side_rows
+                if line["player"] in (row.player.name, row.player.tracker)
+            ),
+            None,
+        )
+        if row is not None:
+            player = row.player
+        else:
+            # A substitute takes the place of the player of a slot
+            candidates = [
+                player
+                for player in players.get(line["player"], ())
+                if player.split == match.split
+            ]
+            if len(candidates) != 1:
+                errors.append(
+                    f"Ligne {number} : joueur inconnu : {line['player']}."
+                    if not candidates
+                    else f"Ligne {number} : plusieurs joueurs s'appellent "
+                    f"{line['player']}, utilisez le tracker."
+                )
+                continue
+            player = candidates[0]
+            row = next((row for row in side_rows if row.slot == line["slot"]), None)
+            if row is None:
+                errors.append(
+                    f"Ligne {number} : {player} ne fait pas partie de l'équipe "
+                    f"{line['side']} du match {match.id}, indiquez son slot."
+                )
+                continue
+        if row.pk in sheet:
+            errors.append(f"Ligne {number} : {player} apparaît deux fois.")
+            continue
+        sheet[row.pk] = (row, line, player)
+
+    if errors:
+        raise ScoreSheetError(errors)
+
+    differences = []
+    updated_matches = []
+    for match_id, (score_a, score_b) in scores.items():
+        match = matches[match_id]
+        if (match.team_A_score, match.team_B_score) != (score_a, score_b):
+            differences.append(
+                f"{match.team_A} - {match.team_B} : "
+                f"{match.team_A_score}-{match.team_B_score} → {score_a}-{score_b}"
+            )
+            match.team_A_score, match.team_B_score = score_a, score_b
+            updated_matches.append(match)
+
+    updated_rows = []
+    player_ids = set()
+    for row, line, player in sheet.values():
+        changes = []
+        if row.player_id != player.id:
+            changes.append(f"{row.player} remplacé")
+            player_ids.add(row.player_id)
+            row.player = player
+        for stat in STATS:
+            if getattr(row, stat) != line[stat]:
+                changes.append(f"{stat} {getattr(row, stat)} → {line[stat]}")
+                setattr(row, stat, line[stat])
+        if changes:
+            differences.append(f"Match {row.match_id}, {player} : {', '.join(changes)}")
+            player_ids.add(player.id)
+            updated_rows.append(row)
+
+    if dry_run or not differences:
+        return differences
+
+    team_ids = {
+        team_id
+        for match in matches.values()
+        if match.id in scores
+        for team_id in (match.team_A_id, match.team_B_id)
+    }
+    with transaction.atomic():
+        Match.objects.bulk_update(
+            updated_matches, ["team_A_score", "team_B_score"], batch_size=500
+        )
+        MatchPlayerStat.objects.bulk_update(
+            updated_rows, ["player", *STATS], batch_size=500
+        )
+        # The updates send no signal: the counters are recomputed once
+        stats.refresh(player_ids, team_ids)
+        pages.invalidate()
+    return differences
+
+
+def _clean(number, line, errors):
+    # Checks and converts the values of a line of the sheet
+    try:
+        values = {
+            "number": number,
+            "match_id": int(line["match_id"]),
+            "side": str(line["side"]).upper(),
+            "player": str(line["player"]).strip(),
+            "team_score": int(line["team_score"]),
+            "opponent_score": int(line["opponent_score"]),
+            "slot": int(line["slot"]) if line.get("slot") not in (None, "") else None,
+        }
+        for stat in STATS:
+            values[stat] = int(line.get(stat) or 0)
+    except KeyError as error:
+        errors.append(f"Ligne {number} : la colonne {error} manque.")
+        return None
+    except (TypeError, ValueError):
+        errors.append(f"Ligne {number} : une valeur n'est pas un nombre entier.")
+        return None
+    if values["side"] not in ("A", "B"):
+        errors.append(f"Ligne {number} : le côté doit être A ou B.")
+        return None
+    return values
+
+
+def _find_players(references):
+    # Players designated by their name or their tracker URL, with one query
+    found = {}
+    for player in Player.objects.filter(
+        Q(name__in=references) | Q(tracker__in=references)
+    ):
+        for reference in {player.name, player.tracker} & references:
+            found.setdefault(reference, []).append(player)
+    return found
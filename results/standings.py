@@ -0,0 +1,174 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from teams.models import Team
+
+# Promotion and relegation zones of each league, as (first, last, class) positions
+ZONES = {
+    1: ((6, 6, "table-warning"), (7, None, "table-danger")),
+    2: ((1, 2, "table-success"), (5, 5, "table-warning"), (6, None, "table-danger")),
+    3: ((1, 2, "table-success"), (6, 6, "table-warning"), (7, None, "table-danger")),
+    4: ((1, 3, "table-warning"),),
+}
+
+# Counters of a team copied into its standing: the matches played, then the
+# tiebreak keys in the order they decide between two teams
+COUNTERS = ("matches_played", "wins", "lose", "bo_diff", "bo_wins", "bo_lose")
+
+
+def zone(league, position):
+    """
+    Returns the class of the row of a team in the standings of its league.
+
+    Args:
+        league (int): The league of the team.
+        position (int): The position of the team in its league, from 1.
+
+    Returns:
+        str: The class of the promotion or relegation zone, or an empty string.
+    """
+
+    for first, last, css_class in ZONES.get(league, ()):
+        if first <= position and (last is None or position <= last):
+            return css_class
+    return ""
+
+
+def head_to_head(matches):
+    """
+    Builds the win matrix of a set of matches.
+
+    Args:
+        matches (iterable): The played matches as (team A id, team B id, team A
+            score, team B score) tuples.
+
+    Returns:
+        dict: The (wins, BO won) of each team against each opponent, keyed by
+        (team id, opponent id).
+    """
+
+    matrix = {}
+    for team_a, team_b, score_a, score_b in matches:
+        for team, opponent, won, lost in (
+            (team_a, team_b, score_a, score_b),
+            (team_b, team_a, score_b, score_a),
+        ):
+            wins, bo_wins = matrix.get((team, opponent), (0, 0))
+            matrix[team, opponent] = (wins + (won > lost), bo_wins + won)
+    return matrix
+
+
+def rank(teams, matrix=None):
+    """
+    Ranks the teams of a league.
+
+    Teams are ranked by wins, losses and BO difference. Teams tied on all three are
+    ranked by the results of the matches between them: wins, then BO difference.
+    Teams still tied on those are ranked again by the matches between them only,
+    until the mini-league cannot tell them apart, when the BO won and lost decide.
+
+    Args:
+        teams (iterable): The teams of the league.
+        matrix (dict): The win matrix of the league, as built by `head_to_head`.
+
+    Returns:
+        list: The teams, from the first to the last.
+    """
+
+    groups = {}
+    for team in teams:
+        groups.setdefault((-team.wins, team.lose, -team.bo_diff), []).append(team)
+    return [
+        team for key in sorted(groups) for team in _break_tie(groups[key], matrix or {})
+    ]
+
+
+def refresh_standings(team_ids=(), groups=()):
+    """
+    Recomputes the standings of the leagues of some teams.
+
+    The teams of the leagues and the results of their matches are read with one
+    query each and ranked in memory, then the standings of the leagues are replaced
+    in one transaction, so that they are never seen half written.
+
+    Args:
+        team_ids (iterable): The ids of teams whose league has to be ranked again.
+        groups (iterable): (split, league) pairs to rank again.
+    """
+
+    from results.models import UNPLAYED, Match, Standing
+
+    team_ids = set(team_ids) - {None}
+    scope = Q()
+    for split, league in set(groups):
+        scope |= Q(split=split, league=league)
+    if team_ids:
+        # The leagues of the teams are found by the query that reads them
+        scope |= Q(
+            Exists(
+                Team.objects.filter(
+                    pk__in=team_ids, split=OuterRef("split"), league=OuterRef("league")
+                )
+            )
+        )
+    if not scope:
+        return
+
+    leagues = {}
+    for team in Team.objects.filter(scope).only("split", "league", *COUNTERS):
+        leagues.setdefault((team.split, team.league), []).append(team)
+    if not leagues:
+        return
+
+    # Results of the matches between the teams of every league, at once
+    played = Q()
+    for split, league in leagues:
+        played |= Q(split=split, league=league)
+    matrix = head_to_head(
+        Match.objects.filter(played)
+        .exclude(UNPLAYED)
+        .values_list("team_A_id", "team_B_id", "team_A_score", "team_B_score")
+    )
+
+    standings = [
+        Standing(
+            team_id=team.id,
+            split=split,
+            league=league,
+            position=position,
+            zone=zone(league, position),
+            **{counter: getattr(team, counter) for counter in COUNTERS},
+        )
+        for (split, league), teams in leagues.items()
+        for position, team in enumerate(rank(teams, matrix), 1)
+    ]
+
+    # Teams that moved to another league leave their previous standings too
+    stale = Q(team_id__in=team_ids)
+    for split, league in set(groups) | leagues.keys():
+        stale |= Q(split=split, league=league)
+
+    with transaction.atomic(savepoint=False):
+        Standing.objects.filter(stale).delete()
+        Standing.objects.bulk_create(standings, batch_size=500)
+
+
+def _break_tie(teams, matrix):
+    if len(teams) == 1:
+        return teams
+
+    # Mini-league of the matches between the tied teams
+    ids = [team.id for team in teams]
+    groups = {}
+    for team in teams:
+        wins = bo_diff = 0
+        for opponent in ids:
+            won, bo_won = matrix.get((team.id, opponent), (0, 0))
+            wins += won
+            bo_diff += bo_won - matrix.get((opponent, team.id), (0, 0))[1]
+        groups.setdefault((-wins, -bo_diff), []).append(team)
+
+    if len(groups) == 1:
+        # The matches between them do not tell the teams apart
+        return sorted(teams, key=lambda team: (-team.bo_wins, team.bo_lose, team.id))
+    return [team for key in sorted(groups) for team in _break_tie(groups[key], matrix)]
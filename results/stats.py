@@ -0,0 +1,641 @@
+from contextlib import ContextDecorator, contextmanager
+import threading
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from interligue import pages
+from results.standings import refresh_standings
+from teams.models import STATS, Player, Team, TeamMembership
+
+# Result counters maintained on each team
+TEAM_STATS = ("matches_played", "wins", "lose", "bo_wins", "bo_lose", "bo_diff")
+
+# Columns of a match that the team results depend on
+MATCH_FIELDS = ("team_A_id", "team_B_id", "team_A_score", "team_B_score")
+
+# Columns of a statistics row that the player and team counters depend on
+ROW_FIELDS = ("match_id", "side", "player_id", *STATS)
+
+
+def match_snapshot(match):
+    """
+    Returns the values of a match that the team results depend on.
+
+    Args:
+        match (Match): The match to read.
+
+    Returns:
+        dict: The values of the match, keyed by column name.
+    """
+
+    return {field: getattr(match, field) for field in MATCH_FIELDS}
+
+
+def load_match_snapshot(match):
+    """
+    Returns the values of a match as currently stored in the database.
+
+    Inside a transaction, the row is locked until it is committed, so that two
+    saves of the same match cannot both start from the same values.
+
+    Args:
+        match (Match): The match about to be saved.
+
+    Returns:
+        dict: The stored values of the match, or None if it is not saved yet.
+    """
+
+    if match.pk is None:
+        return None
+    return _stored(match).values(*MATCH_FIELDS).first()
+
+
+def row_snapshot(row, previous=None):
+    """
+    Returns the values of a player's statistics row that the counters depend on.
+
+    Args:
+        row (MatchPlayerStat): The row to read.
+        previous (dict): The stored snapshot of the row, used to avoid loading its
+            match again when it did not move.
+
+    Returns:
+        dict: The player id, the team id and the statistics of the row.
+    """
+
+    if (
+        previous is not None
+        and previous["match_id"] == row.match_id
+        and previous["side"] == row.side
+    ):
+        team_id = previous["team_id"]
+    else:
+        team_id = getattr(row.match, f"team_{row.side}_id")
+
+    values = {stat: getattr(row, stat) for stat in STATS}
+    values.update(
+        match_id=row.match_id, side=row.side, player_id=row.player_id, team_id=team_id
+    )
+    return values
+
+
+def load_row_snapshot(row):
+    """
+    Returns the values of a player's statistics row as currently stored in the database.
+
+    Inside a transaction, the row is locked until it is committed, so that two
+    saves of the same row cannot both start from the same values.
+
+    Args:
+        row (MatchPlayerStat): The row about to be saved.
+
+    Returns:
+        dict: The stored values of the row, or None if it is not saved yet.
+    """
+
+    if row.pk is None:
+        return None
+
+    values = (
+        _stored(row).values(*ROW_FIELDS, "match__team_A_id", "match__team_B_id").first()
+    )
+    if values is None:
+        return None
+    values["team_id"] = values.pop(f"match__team_{values['side']}_id")
+    values.pop("match__team_A_id", None)
+    values.pop("match__team_B_id", None)
+    return values
+
+
+def match_contributions(values):
+    """
+    Computes what the result of a match adds to the team counters.
+
+    Args:
+        values (dict): A snapshot of the match, or None.
+
+    Returns:
+        dict: The counters of the teams, keyed by team id.
+    """
+
+    teams = {}
+    if values is None:
+        return teams
+
+    scores = {"A": values["team_A_score"], "B": values["team_B_score"]}
+    for side, opponent in (("A", "B"), ("B", "A")):
+        team = teams.setdefault(values[f"team_{side}_id"], _empty(TEAM_STATS))
+        team["bo_wins"] += scores[side]
+        team["bo_lose"] += scores[opponent]
+        team["bo_diff"] += scores[side] - scores[opponent]
+        if scores[side] != scores[opponent]:
+            team["matches_played"] += 1
+            team["wins" if scores[side] > scores[opponent] else "lose"] += 1
+    return teams
+
+
+def row_contributions(rows):
+    """
+    Computes what players' statistics rows add to the player and team counters.
+
+    Args:
+        rows (iterable): Snapshots of the rows, None standing for a missing row.
+
+    Returns:
+        tuple: Two dictionaries mapping player ids and team ids to their counters.
+    """
+
+    players, teams = {}, {}
+    for values in rows:
+        if values is None:
+            continue
+        for totals, key in ((players, "player_id"), (teams, "team_id")):
+            counters = totals.setdefault(values[key], _empty(STATS))
+            for stat in STATS:
+                counters[stat] += values[stat]
+    return players, teams
+
+
+def difference(new, old):
+    """
+    Subtracts the counters of `old` from the counters of `new`.
+
+    Args:
+        new (dict): Counters keyed by object id.
+        old (dict): Counters keyed by object id.
+
+    Returns:
+        dict: The non-zero differences, keyed by object id.
+    """
+
+    deltas = {}
+    for pk in new.keys() | old.keys():
+        counters = new.get(pk, {})
+        previous = old.get(pk, {})
+        delta = {
+            field: counters.get(field, 0) - previous.get(field, 0)
+            for field in counters.keys() | previous.keys()
+        }
+        delta = {field: value for field, value in delta.items() if value}
+        if delta:
+            deltas[pk] = delta
+    return deltas
+
+
+def apply_deltas(model, deltas):
+    """
+    Adds counters to several objects with a single atomic UPDATE.
+
+    Args:
+        model (Model): The model class of the objects.
+        deltas (dict): The amounts to add, keyed by object id then field name.
+    """
+
+    if not deltas:
+        return
+
+    fields = {field for delta in deltas.values() for field in delta}
+    updates = {}
+    for field in fields:
+        whens = [
+            When(pk=pk, then=Value(delta[field]))
+            for pk, delta in deltas.items()
+            if field in delta
+        ]
+        updates[field] = F(field) + Case(
+            *whens, default=Value(0), output_field=IntegerField()
+        )
+    model._default_manager.filter(pk__in=deltas.keys()).update(**updates)
+
+
+def apply_match_delta(old, new):
+    """
+    Updates the team counters and the standings after the result of a match has changed.
+
+    Args:
+        old (dict): The snapshot of the match before the change, or None.
+        new (dict): The snapshot of the match after the change, or None.
+    """
+
+    if _defer(teams=[*match_contributions(old), *match_contributions(new)]):
+        return
+    deltas = difference(match_contributions(new), match_contributions(old))
+    apply_deltas(Team, deltas)
+    refresh_standings(deltas)
+
+
+def apply_row_delta(old, new):
+    """
+    Updates the player and team counters after a player's statistics have changed.
+
+    Args:
+        old (dict): The snapshot of the row before the change, or None.
+        new (dict): The snapshot of the row after the change, or None.
+    """
+
+    apply_rows_delta([old], [new])
+
+
+def apply_rows_delta(old, new):
+    """
+    Updates the player and team counters after several statistics rows have changed.
+
+    Args:
+        old (list): The snapshots of the rows before the change.
+        new (list): The snapshots of the rows after the change.
+    """
+
+    old_players, old_teams = row_contributions(old)
+    new_players, new_teams = row_contributions(new)
+    if _defer([*old_players, *new_players], [*old_teams, *new_teams]):
+        return
+    apply_deltas(Player, difference(new_players, old_players))
+    apply_deltas(Team, difference(new_teams, old_teams))
+
+
+def reverse_matches(matches):
+    """
+    Removes what several matches added to the player and team counters.
+
+    The statistics are grouped per player and per team in the database and
+    subtracted with one atomic UPDATE per model, so that concurrent changes to the
+    counters are not lost.
+
+    Args:
+        matches (QuerySet): The matches about to be deleted.
+    """
+
+    from results.models import MatchPlayerStat
+
+    rows = MatchPlayerStat.objects.filter(match__in=matches).order_by()
+    if _is_deferred():
+        teams = set()
+        for team_a_id, team_b_id in matches.values_list("team_A_id", "team_B_id"):
+            teams.update((team_a_id, team_b_id))
+        _defer(rows.values_list("player_id", flat=True), teams)
+        return
+
+    sums = {f"total_{stat}": Sum(stat) for stat in STATS}
+
+    # Statistics of the players, and of the team they played for
+    players = {
+        row["player_id"]: {stat: -row[f"total_{stat}"] for stat in STATS}
+        for row in rows.values("player_id").annotate(**sums)
+    }
+    teams = {}
+    for row in rows.annotate(team_id=_side_team()).values("team_id").annotate(**sums):
+        teams[row["team_id"]] = {stat: -row[f"total_{stat}"] for stat in STATS}
+
+    # Results of the teams
+    for match in matches.values(*MATCH_FIELDS):
+        for team_id, counters in match_contributions(match).items():
+            team = teams.setdefault(team_id, {})
+            for field, value in counters.items():
+                team[field] = team.get(field, 0) - value
+
+    apply_deltas(Player, difference(players, {}))
+    apply_deltas(Team, difference(teams, {}))
+
+
+@contextmanager
+def removed(matches=(), rows=()):
+    """
+    Context manager inside which deleting matches or statistics rows leaves the
+    counters alone.
+
+    The caller has already removed what the matches and rows added to the
+    counters, so that their deletion signals must not do it again.
+
+    Args:
+        matches (iterable): The ids of the matches about to be deleted.
+        rows (iterable): The ids of the statistics rows about to be deleted.
+    """
+
+    marked = _removed()
+    keys = {("match", pk) for pk in matches} | {("row", pk) for pk in rows}
+    keys -= marked
+    marked.update(keys)
+    try:
+        yield
+    finally:
+        marked.difference_update(keys)
+
+
+def is_removed(match_id=None, row_id=None):
+    """
+    Tells whether what a match or a statistics row added to the counters has
+    already been removed.
+
+    Args:
+        match_id (int): The id of a match about to be deleted.
+        row_id (int): The id of a statistics row about to be deleted.
+
+    Returns:
+        bool: True inside `removed` for the match or the row.
+    """
+
+    marked = _removed()
+    return ("match", match_id) in marked or ("row", row_id) in marked
+
+
+def refresh(player_ids=(), team_ids=()):
+    """
+    Recomputes the counters of several players, then of several teams.
+
+    Inside `deferred_stats`, the ids are only recorded and recomputed once the
+    transaction is committed.
+
+    Args:
+        player_ids (iterable): The ids of the players to refresh.
+        team_ids (iterable): The ids of the teams to refresh.
+    """
+
+    if _defer(player_ids, team_ids):
+        return
+    refresh_players(player_ids)
+    refresh_teams(team_ids)
+
+
+def refresh_players(player_ids, batch_size=500):
+    """
+    Recomputes the counters of several players with one grouped query.
+
+    Args:
+        player_ids (iterable): The ids of the players to refresh.
+        batch_size (int): The number of rows read per chunk.
+    """
+
+    save_totals(player_totals(player_ids, batch_size), {}, batch_size)
+
+
+def refresh_teams(team_ids, batch_size=500):
+    """
+    Recomputes the counters of several teams from their matches, then the
+    standings of their leagues.
+
+    Args:
+        team_ids (iterable): The ids of the teams to refresh.
+        batch_size (int): The number of objects read or written per query.
+    """
+
+    save_totals({}, team_totals(team_ids, batch_size), batch_size)
+
+
+def player_totals(player_ids, batch_size=500):
+    """
+    Adds up the statistics rows of several players with one grouped query.
+
+    Args:
+        player_ids (iterable): The ids of the players.
+        batch_size (int): The number of rows read per chunk.
+
+    Returns:
+        dict: The counters of the players, keyed by player id.
+    """
+
+    from results.models import MatchPlayerStat
+
+    player_ids = set(player_ids) - {None}
+    if not player_ids:
+        return {}
+
+    totals = {pk: _empty(STATS) for pk in player_ids}
+    rows = (
+        MatchPlayerStat.objects.filter(player_id__in=player_ids)
+        .order_by()
+        .values("player_id")
+        .annotate(**{f"total_{stat}": Sum(stat) for stat in STATS})
+    )
+    for row in rows.iterator(chunk_size=batch_size):
+        totals[row["player_id"]] = {stat: row[f"total_{stat}"] for stat in STATS}
+    return totals
+
+
+def team_totals(team_ids, batch_size=500):
+    """
+    Adds up the results and the statistics of several teams.
+
+    The results of all the matches of the teams are read with one query and the
+    statistics of the players on their side with another, whatever the number of
+    teams. Players who changed teams keep their past statistics with the team they
+    played for.
+
+    Args:
+        team_ids (iterable): The ids of the teams.
+        batch_size (int): The number of rows read per chunk.
+
+    Returns:
+        dict: The counters of the teams that exist, keyed by team id.
+    """
+
+    from results.models import Match, MatchPlayerStat
+
+    team_ids = set(team_ids) - {None}
+    if not team_ids:
+        return {}
+
+    # Add up the results of every team
+    totals = {
+        pk: _empty(STATS + TEAM_STATS)
+        for pk in Team.objects.filter(pk__in=team_ids).values_list("id", flat=True)
+    }
+    matches = Match.objects.filter(
+        Q(team_A_id__in=team_ids) | Q(team_B_id__in=team_ids)
+    ).values(*MATCH_FIELDS)
+    for match in matches.iterator(chunk_size=batch_size):
+        for team_id, counters in match_contributions(match).items():
+            if team_id in totals:
+                for field, value in counters.items():
+                    totals[team_id][field] += value
+
+    # The statistics of a team are those of the players on its side of its matches
+    rows = (
+        MatchPlayerStat.objects.filter(
+            Q(side="A", match__team_A_id__in=team_ids)
+            | Q(side="B", match__team_B_id__in=team_ids)
+        )
+        .annotate(team_id=_side_team())
+        .order_by()
+        .values("team_id")
+        .annotate(**{f"total_{stat}": Sum(stat) for stat in STATS})
+    )
+    for row in rows:
+        if row["team_id"] in totals:
+            totals[row["team_id"]].update(
+                {stat: row[f"total_{stat}"] for stat in STATS}
+            )
+    return totals
+
+
+def save_totals(players, teams, batch_size=500):
+    """
+    Writes the counters of several players and teams, then ranks the leagues of the
+    teams again.
+
+    Args:
+        players (dict): The counters of the players, keyed by player id.
+        teams (dict): The counters of the teams, keyed by team id.
+        batch_size (int): The number of objects written per UPDATE query.
+    """
+
+    Player.objects.bulk_update(
+        [Player(pk=pk, **values) for pk, values in players.items()],
+        STATS,
+        batch_size=batch_size,
+    )
+    Team.objects.bulk_update(
+        [Team(pk=pk, **values) for pk, values in teams.items()],
+        STATS + TEAM_STATS,
+        batch_size=batch_size,
+    )
+    refresh_standings(teams)
+
+
+def totals(split=None, league=None, batch_size=500):
+    """
+    Computes from scratch the counters of the players and teams of a scope, without
+    writing them.
+
+    The statistics rows are added up by grouped queries and the results of the
+    matches are streamed once, then the totals are accumulated in memory.
+
+    Args:
+        split (int): Only count the players and teams of this split.
+        league (int): Only count the teams of this league and their players.
+        batch_size (int): The number of rows read per chunk.
+
+    Returns:
+        tuple: The counters of the players and of the teams, keyed by id.
+    """
+
+    from results.models import Match, MatchPlayerStat
+
+    teams = Team.objects.all()
+    if split is not None:
+        teams = teams.filter(split=split)
+    if league is not None:
+        teams = teams.filter(league=league)
+    team_ids = set(teams.values_list("id", flat=True))
+    player_ids = set(
+        TeamMembership.objects.filter(
+            team_id__in=team_ids, left__isnull=True
+        ).values_list("player_id", flat=True)
+    )
+
+    # Players of the scope: the whole split, or the rosters of the league's teams
+    # and anyone who played one of their matches
+    if league is None:
+        players = Player.objects.all()
+        if split is not None:
+            players = players.filter(split=split)
+        player_ids = set(players.values_list("id", flat=True))
+    else:
+        matches = Match.objects.filter(Q(team_A__in=team_ids) | Q(team_B__in=team_ids))
+        player_ids.update(
+            MatchPlayerStat.objects.filter(match__in=matches).values_list(
+                "player_id", flat=True
+            )
+        )
+
+    return player_totals(player_ids, batch_size), team_totals(team_ids, batch_size)
+
+
+def rebuild(split=None, league=None, batch_size=500):
+    """
+    Recomputes from scratch the counters of the players and teams of a scope.
+
+    The totals are computed first, then written back in batches in one transaction.
+
+    Args:
+        split (int): Only rebuild the players and teams of this split.
+        league (int): Only rebuild the teams of this league and their players.
+        batch_size (int): The number of objects written per UPDATE query.
+
+    Returns:
+        tuple: The number of players and teams that were rebuilt.
+    """
+
+    players, teams = totals(split, league, batch_size)
+    with transaction.atomic():
+        save_totals(players, teams, batch_size)
+        pages.invalidate()
+    return len(players), len(teams)
+
+
+class deferred_stats(ContextDecorator):
+    """
+    Context manager and decorator that coalesces the updates of the statistics.
+
+    Inside it, saving matches, statistics rows or teams only records the players
+    and teams whose counters are affected. They are recomputed once, in bulk, when
+    the transaction opened by the outermost `deferred_stats` is committed.
+    """
+
+    def _recreate_cm(self):
+        # Each decorated call needs its own transaction
+        return type(self)()
+
+    def __enter__(self):
+        self._atomic = transaction.atomic()
+        self._atomic.__enter__()
+        if not _is_deferred():
+            players = _state.players = set()
+            teams = _state.teams = set()
+            # Planned before anything is saved, so that the counters are recomputed
+            # before the public pages are rendered again
+            transaction.on_commit(lambda: _flush(players, teams))
+        _state.depth = getattr(_state, "depth", 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _state.depth -= 1
+        return self._atomic.__exit__(exc_type, exc_value, traceback)
+
+
+_state = threading.local()
+
+
+def _removed():
+    if not hasattr(_state, "removed"):
+        _state.removed = set()
+    return _state.removed
+
+
+def _is_deferred():
+    return getattr(_state, "depth", 0) > 0
+
+
+def _defer(players=(), teams=()):
+    if not _is_deferred():
+        return False
+    _state.players.update(players)
+    _state.teams.update(teams)
+    return True
+
+
+def _flush(players, teams):
+    with transaction.atomic():
+        refresh_players(players)
+        refresh_teams(teams)
+        # The counters and standings are written with bulk queries, which send no
+        # signal
+        pages.invalidate()
+
+
+def _stored(instance):
+    rows = type(instance)._default_manager.filter(pk=instance.pk)
+    if not transaction.get_autocommit():
+        # Outside a transaction the lock would be released at once
+        rows = rows.select_for_update(of=("self",))
+    return rows
+
+
+def _side_team():
+    # The team a statistics row counts for
+    return Case(
+        When(side="A", then=F("match__team_A_id")), default=F("match__team_B_id")
+    )
+
+
+def _empty(fields):
+    return dict.fromkeys(fields, 0)
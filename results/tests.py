@@ -1,3 +1,1209 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import csv
+import datetime
+import importlib.util
+import json
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models.signals import pre_delete
+from django.db.models import F, Q
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authentication.models import User
+from configuration.split import current_split
+from interligue import pages, settings
+from results import stats
+from results.calendars import assign_weeks, round_robin, schedule
+from results.scheduling import schedule_dates, solve
+from results.standings import head_to_head, rank, refresh_standings
+from results.middleware import DeferredStatsMiddleware
+from results.exports import COLUMNS, player_stat_rows
+from results.management.commands import rebuild_stats
+from results.models import (
+    UNPLAYED,
+    Match,
+    MatchPlayerStat,
+    Slot,
+    Standing,
+    Unavailability,
+)
+from teams.models import Player, Team, TeamMembership
+from teams.tests import create_team, roster
+
+PLAYER_COUNTERS = ("score", "goals", "assists", "saves", "shots")
+TEAM_COUNTERS = PLAYER_COUNTERS + (
+    "matches_played",
+    "wins",
+    "lose",
+    "bo_wins",
+    "bo_lose",
+    "bo_diff",
+)
+
+
+def counters():
+    """
+    Returns the statistics of every player and team, keyed by id.
+    """
+
+    return (
+        {p["id"]: p for p in Player.objects.values("id", *PLAYER_COUNTERS)},
+        {t["id"]: t for t in Team.objects.values("id", *TEAM_COUNTERS)},
+    )
+
+
+def recompute():
+    """
+    Recomputes the statistics of every player and team from scratch.
+    """
+
+    for player_id in Player.objects.values_list("id", flat=True):
+        Player.set_statistics(player_id)
+    for team in Team.objects.all():
+        team.set_statistics()
+        team.set_teams_stats()
+
+
+class StatisticsTestCase(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff")
+        self.teams = [
+            create_team(self.staff, name, size=size)
+            for name, size in (("Alpha", 3), ("Bravo", 4), ("Charlie", 5))
+        ]
+
+    def play(self, match, score_a, score_b, goals=1):
+        match.team_A_score = score_a
+        match.team_B_score = score_b
+        match.save()
+        for row in match.player_stats.all():
+            row.score = 100 * row.slot
+            row.goals = goals
+            row.saves = row.slot
+            row.save()
+
+    def test_matches_have_a_statistics_row_per_player(self):
+        for match in Match.objects.select_related("team_A", "team_B"):
+            self.assertEqual(
+                list(match.player_stats.values_list("side", "player__name")),
+                [("A", player.name) for player in roster(match.team_A)]
+                + [("B", player.name) for player in roster(match.team_B)],
+            )
+
+    def test_incremental_statistics_match_full_recompute(self):
+        matches = list(Match.objects.order_by("id"))
+        self.assertEqual(len(matches), 3)
+
+        self.play(matches[0], 3, 1)
+        self.play(matches[1], 0, 3, goals=2)
+        self.play(matches[2], 2, 3)
+        # Correct a result that was already entered
+        self.play(matches[0], 1, 3, goals=4)
+
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+
+    def test_played_matches_keep_the_players_who_played_them(self):
+        played, unplayed = Match.objects.order_by("id")[:2]
+        self.play(played, 3, 1)
+        # Statistics entered before the result of the match
+        unplayed.player_stats.filter(side="A", slot=1).update(goals=2)
+        Player.objects.filter(name="Alpha 1").update(goals=F("goals") + 2)
+        Team.objects.filter(name="Alpha").update(goals=F("goals") + 2)
+
+        membership = played.team_A.memberships.get(slot=1)
+        leaving = membership.player
+        joining = Player.objects.create(
+            name="Newcomer", tracker="https://rocketleague.tracker.network/new"
+        )
+        membership.player = joining
+        membership.save()
+
+        self.assertEqual(played.player_stats.get(side="A", slot=1).player, leaving)
+        self.assertEqual(unplayed.player_stats.get(side="A", slot=1).player, joining)
+        leaving.refresh_from_db()
+        joining.refresh_from_db()
+        self.assertEqual((leaving.score, leaving.goals), (100, 1))
+        self.assertEqual((joining.score, joining.goals), (0, 2))
+
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+
+    def test_roster_change_adds_and_removes_player_rows(self):
+        played = Match.objects.order_by("id").first()
+        self.play(played, 3, 1)
+        team = self.teams[1]
+        membership = team.memberships.get(slot=4)
+        leaving = membership.player
+        membership.left = datetime.date.today()
+
+        # Stored membership, membership, team, roster, sides, rows, then the rows
+        # to delete and their delete, in two savepoints; the row removed was empty
+        # so no counter is touched
+        with self.assertNumQueries(12):
+            membership.save()
+
+        TeamMembership.objects.create(
+            team=team,
+            slot=5,
+            player=Player.objects.create(
+                name="Newcomer", tracker="https://rocketleague.tracker.network/new"
+            ),
+        )
+
+        # The played match keeps its rows, the others follow the roster
+        self.assertEqual(
+            list(played.player_stats.filter(side="B").values_list("slot", flat=True)),
+            [1, 2, 3, 4],
+        )
+        for match in Match.objects.exclude(pk=played.pk):
+            self.assertEqual(
+                list(match.player_stats.values_list("player__name", flat=True)),
+                [player.name for player in roster(match.team_A)]
+                + [player.name for player in roster(match.team_B)],
+            )
+        leaving.refresh_from_db()
+        self.assertEqual(leaving.score, 400)
+
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+
+    def test_deleting_a_match_removes_its_results_and_statistics(self):
+        match = Match.objects.order_by("id").first()
+        self.play(match, 3, 1, goals=2)
+
+        match.delete()
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+        self.assertEqual(
+            list(Standing.objects.values_list("wins", "lose", "bo_diff")),
+            [(0, 0, 0)] * 3,
+        )
+
+    def test_a_failed_delete_does_not_hide_the_next_one(self):
+        match = Match.objects.order_by("id").first()
+        self.play(match, 3, 1, goals=2)
+
+        def fail(sender, **kwargs):
+            raise IntegrityError
+
+        pre_delete.connect(fail, sender=Match)
+        try:
+            doomed = Match.objects.get(pk=match.pk)
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                doomed.delete()
+        finally:
+            pre_delete.disconnect(fail, sender=Match)
+
+        # The instance of the failed delete is still at hand
+        self.assertEqual(doomed.pk, match.pk)
+        match.delete()
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+
+    def test_deleting_a_team_removes_its_matches_from_the_opponents(self):
+        for match in Match.objects.all():
+            self.play(match, 3, 1)
+
+        self.teams[0].delete()
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+        self.assertEqual(
+            {
+                standing.team_id: (standing.wins, standing.lose, standing.bo_diff)
+                for standing in Standing.objects.all()
+            },
+            {
+                team.id: (team.wins, team.lose, team.bo_diff)
+                for team in Team.objects.all()
+            },
+        )
+
+    def test_deleting_a_player_removes_their_statistics_from_their_teams(self):
+        for match in Match.objects.all():
+            self.play(match, 3, 1, goals=2)
+
+        Player.objects.get(name="Alpha 1").delete()
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+
+        # A single row leaves the counters too
+        MatchPlayerStat.objects.filter(player__name="Bravo 2").first().delete()
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+
+    def test_refreshing_players_sums_all_their_rows(self):
+        for match in Match.objects.all():
+            self.play(match, 3, 1)
+        expected = counters()
+        Player.objects.update(score=0, goals=0)
+
+        stats.refresh_players(Player.objects.values_list("id", flat=True))
+        self.assertEqual(counters(), expected)
+
+    def test_saving_a_result_costs_a_constant_number_of_queries(self):
+        match = Match.objects.order_by("id").first()
+        match.team_A_score = 3
+
+        # Read the stored match, save it, update the teams, rank their league again
+        with self.assertNumQueries(7):
+            match.save()
+
+        row = match.player_stats.first()
+        row.goals = 2
+
+        # Read the stored row, save it, update the player and the team
+        with self.assertNumQueries(4):
+            row.save()
+
+        # A match that was not loaded from the database costs the same
+        match = Match(pk=match.pk, team_A_id=match.team_A_id, team_B_id=match.team_B_id)
+        with self.assertNumQueries(7):
+            match.save()
+
+    def test_stale_instances_apply_the_change_once(self):
+        match = Match.objects.order_by("id").first()
+        stale = Match.objects.get(pk=match.pk)
+        for instance in (match, stale):
+            instance.team_A_score = 3
+            instance.save()
+
+        team = Team.objects.get(pk=match.team_A_id)
+        self.assertEqual((team.wins, team.bo_diff), (1, 3))
+
+        row = match.player_stats.first()
+        stale = MatchPlayerStat.objects.get(pk=row.pk)
+        for instance in (row, stale):
+            instance.goals = 2
+            instance.save()
+        self.assertEqual(Player.objects.get(pk=row.player_id).goals, 2)
+
+        # A league change made through another instance is not missed
+        team = Team.objects.get(pk=self.teams[0].pk)
+        stale = Team.objects.get(pk=team.pk)
+        team.league = 2
+        team.save()
+        stale.league = 3
+        stale.save()
+        self.assertEqual(
+            list(Standing.objects.filter(league=2).values_list("team_id", flat=True)),
+            [],
+        )
+        self.assertEqual(Standing.objects.get(team=team).league, 3)
+
+    def test_rescheduling_a_match_costs_only_its_update(self):
+        match = Match.objects.order_by("id").first()
+        match.week = 2
+        match.date = datetime.date(2023, 6, 1)
+        with self.assertNumQueries(1):
+            match.save(update_fields=["week", "date"])
+
+        # A full save reads the stored scores, which it writes too
+        with self.assertNumQueries(2):
+            match.save()
+
+    def test_a_stale_instance_saving_other_fields_keeps_the_counters_right(self):
+        match = Match.objects.order_by("id").first()
+        stale = Match.objects.get(pk=match.pk)
+        self.play(match, 3, 1)
+
+        # A form opened before the result was entered writes its old scores back
+        stale.date = datetime.date(2023, 6, 1)
+        stale.save()
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+        self.assertEqual(Standing.objects.get(team=match.team_A).wins, 0)
+
+
+class RebuildStatsTestCase(TestCase):
+    def setUp(self):
+        staff = User.objects.create(username="staff")
+        for league, names in (
+            (1, ("Alpha", "Bravo", "Charlie")),
+            (2, ("Delta", "Echo")),
+        ):
+            for size, name in enumerate(names, 3):
+                create_team(staff, name, league=league, size=size)
+        for number, match in enumerate(Match.objects.order_by("id")):
+            match.team_A_score = number % 4
+            match.team_B_score = 3 - number % 4
+            match.save()
+            for row in match.player_stats.all():
+                row.score = 10 * number + row.slot
+                row.shots = number
+                row.save()
+        self.expected = counters()
+
+    def test_rebuild_restores_every_counter(self):
+        Player.objects.update(score=0, shots=42)
+        Team.objects.update(wins=7, bo_diff=0, goals=3)
+
+        call_command("rebuild_stats", "--split", "1", stdout=StringIO())
+        self.assertEqual(counters(), self.expected)
+
+    def test_rebuild_of_a_league_only_touches_its_teams(self):
+        Team.objects.update(wins=7)
+
+        call_command("rebuild_stats", "--league", "2", stdout=StringIO())
+        players, teams = counters()
+        for team in Team.objects.all():
+            expected = self.expected[1][team.id]["wins"] if team.league == 2 else 7
+            self.assertEqual(teams[team.id]["wins"], expected)
+
+
+class ParallelRebuildTestCase(TransactionTestCase):
+    def setUp(self):
+        staff = User.objects.create(username="staff")
+        for league in (1, 2, 3):
+            for number in range(3):
+                create_team(staff, f"Team {league}{number}", league=league)
+        for number, match in enumerate(Match.objects.order_by("id")):
+            match.team_A_score = 3
+            match.team_B_score = number % 3
+            match.save()
+            match.player_stats.update(goals=number)
+        recompute()
+        self.expected = counters()
+
+    def test_workers_only_read_and_the_totals_are_written_at_once(self):
+        Player.objects.update(goals=0)
+        Team.objects.update(wins=7, goals=0)
+
+        # Threads stand in for the processes, which cannot reach the in-memory
+        # test database; the workers must not write, as SQLite locks the file
+        writes = []
+        worker = rebuild_stats.league_totals
+
+        def league_totals(*args):
+            with CaptureQueriesContext(connections["default"]) as queries:
+                result = worker(*args)
+            writes.extend(
+                query["sql"]
+                for query in queries.captured_queries
+                if not query["sql"].startswith("SELECT")
+            )
+            return result
+
+        with mock.patch.object(
+            rebuild_stats, "ProcessPoolExecutor", ThreadPoolExecutor
+        ), mock.patch.object(rebuild_stats, "league_totals", league_totals):
+            call_command("rebuild_stats", "--processes", "3", stdout=StringIO())
+
+        self.assertEqual(writes, [])
+        self.assertEqual(counters(), self.expected)
+        self.assertEqual(
+            sorted(Standing.objects.values_list("team_id", "wins")),
+            sorted(Team.objects.values_list("id", "wins")),
+        )
+
+    def test_both_modes_rebuild_the_same_players_and_teams(self):
+        Player.objects.create(
+            name="Free agent",
+            tracker="https://rocketleague.tracker.network/free",
+            goals=5,
+        )
+
+        def rebuild(*args):
+            Player.objects.update(goals=4, saves=9)
+            Team.objects.update(wins=7)
+            with mock.patch.object(
+                rebuild_stats, "ProcessPoolExecutor", ThreadPoolExecutor
+            ):
+                call_command("rebuild_stats", "--split", "1", *args, stdout=StringIO())
+            return counters()
+
+        serial = rebuild()
+        self.assertEqual(rebuild("--processes", "3"), serial)
+        self.assertEqual(Player.objects.get(name="Free agent").goals, 0)
+
+
+class MatchGenerationTestCase(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff")
+        for number in range(9):
+            create_team(self.staff, f"Team {number}", size=5)
+        create_team(self.staff, "Other league", league=2)
+
+    def test_every_pairing_of_the_league_has_one_match(self):
+        tenth = create_team(self.staff, "Tenth")
+        pairs = Match.objects.filter(league=1).values_list("team_A_id", "team_B_id")
+        self.assertEqual(len(pairs), 45)
+        self.assertEqual(len({frozenset(pair) for pair in pairs}), 45)
+        self.assertEqual(Match.objects.filter(league=2).count(), 0)
+        self.assertEqual(
+            Match.objects.filter(team_B=tenth).first().player_stats.count(), 5 + 3
+        )
+
+    def test_match_generation_costs_a_constant_number_of_queries(self):
+        tenth = create_team(self.staff, "Tenth")
+        matches = Match.objects.filter(Q(team_A=tenth) | Q(team_B=tenth))
+        matches.delete()
+
+        # Existing pairings, teams, new matches, their ids, the rosters, their players
+        with self.assertNumQueries(6):
+            Match.create_matches(tenth)
+        self.assertEqual(matches.count(), 9)
+
+        # Nothing is written when every pairing already exists
+        with self.assertNumQueries(2):
+            Match.create_matches(tenth)
+
+
+class TeamReconciliationTestCase(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff")
+        self.teams = [create_team(self.staff, f"Team {number}") for number in range(4)]
+
+    def test_saving_unscheduled_fields_does_not_touch_matches(self):
+        team = Team.objects.get(pk=self.teams[0].pk)
+        team.name = "Renamed"
+        team.acronym = "REN"
+
+        # The stored league and split, then the update
+        with self.assertNumQueries(2):
+            team.save()
+        with self.assertNumQueries(1):
+            team.save(update_fields=["name", "acronym"])
+
+    def test_league_change_moves_the_team_pairings(self):
+        team = Team.objects.get(pk=self.teams[0].pk)
+        team.league = 2
+        team.save()
+
+        self.assertEqual(Match.objects.filter(league=1).count(), 3)
+        self.assertFalse(Match.objects.filter(Q(team_A=team) | Q(team_B=team)).exists())
+
+        other = Team.objects.get(pk=self.teams[1].pk)
+        other.league = 2
+        other.save()
+        self.assertEqual(
+            list(Match.objects.filter(league=2).values_list("team_A", "team_B")),
+            [(team.id, other.id)],
+        )
+
+    def test_league_change_removes_the_statistics_of_the_old_matches(self):
+        for number, match in enumerate(Match.objects.order_by("id")):
+            match.team_A_score = 3
+            match.team_B_score = number % 3
+            match.save()
+            match.player_stats.update(goals=number, shots=2)
+        Player.objects.update(score=0)
+        recompute()
+
+        Team.objects.filter(pk=self.teams[0].pk).update(league=2)
+        team = Team.objects.get(pk=self.teams[0].pk)
+
+        # The ids of the matches, three grouped reads, one UPDATE per model, then
+        # the matches and their rows, read and deleted, all in one savepoint
+        with self.assertNumQueries(12):
+            Match.delete_matches(team)
+
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+
+
+class DeferredStatsTestCase(TestCase):
+    def setUp(self):
+        staff = User.objects.create(username="staff")
+        for number in range(4):
+            create_team(staff, f"Team {number}", size=4)
+
+    def enter_results(self):
+        for number, match in enumerate(Match.objects.order_by("id")):
+            match.team_A_score = 3
+            match.team_B_score = number % 3
+            match.save()
+            for row in match.player_stats.all():
+                row.goals = number
+                row.saves = row.slot
+                row.save()
+
+    def test_deferred_saves_are_recomputed_once_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with CaptureQueriesContext(connection) as queries, stats.deferred_stats():
+                self.enter_results()
+
+            # Nothing but the saves themselves ran inside the block
+            self.assertFalse(
+                any(
+                    query["sql"].startswith(
+                        ('UPDATE "teams_player"', 'UPDATE "teams_team"')
+                    )
+                    for query in queries.captured_queries
+                )
+            )
+        self.assertEqual(len(set(callbacks) - {pages._refresh}), 1)
+
+        deferred = counters()
+        recompute()
+        self.assertEqual(deferred, counters())
+
+    def test_nothing_is_recomputed_when_the_block_fails(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError), stats.deferred_stats():
+                self.enter_results()
+                raise ValueError
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Match.objects.exclude(team_A_score=0).exists())
+
+    def test_admin_posts_are_deferred(self):
+        def view(request):
+            self.enter_results()
+            return HttpResponse()
+
+        middleware = DeferredStatsMiddleware(view)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            middleware(RequestFactory().post(reverse("admin:index") + "results/"))
+        self.assertEqual(len(set(callbacks) - {pages._refresh}), 1)
+
+        deferred = counters()
+        recompute()
+        self.assertEqual(deferred, counters())
+
+    def test_pages_are_rendered_from_the_counters_of_an_admin_post(self):
+        cache.clear()
+        self.client.get(reverse("standings"))
+        match = Match.objects.order_by("id").first()
+
+        def view(request):
+            match.team_A_score = 3
+            match.save()
+            return HttpResponse()
+
+        middleware = DeferredStatsMiddleware(view)
+        # Pre-warmed right away, since a background thread cannot see the test data
+        with mock.patch.object(
+            pages, "_prewarm_soon", pages.prewarm
+        ), self.captureOnCommitCallbacks(execute=True):
+            middleware(RequestFactory().post(reverse("admin:index") + "results/"))
+
+        # Both pages come from the cache, pre-warmed after the counters were saved
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("standings"))
+            api = self.client.get(reverse("api_standings"))
+        # Third position, then the BO difference and BO won and lost of the match
+        self.assertContains(response, '<td class="text-center">3</td>', count=4)
+        wins = {row["team_id"]: row["wins"] for row in api.json()["results"]}
+        self.assertEqual(wins[match.team_A_id], 1)
+
+
+class ScheduleTestCase(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff")
+        for number in range(5):
+            create_team(self.staff, f"Team {number}")
+
+    def assertWeeksAreValid(self, matches):
+        weeks = {}
+        for week, team_a_id, team_b_id in matches:
+            self.assertIsNotNone(week)
+            teams = weeks.setdefault(week, set())
+            self.assertFalse({team_a_id, team_b_id} & teams)
+            teams.update((team_a_id, team_b_id))
+
+    def test_round_robin_pairs_every_team_once_with_balanced_sides(self):
+        self.assertEqual(round_robin([]), [])
+        for size in range(1, 13):
+            weeks = round_robin(range(size))
+            pairs = [pair for pairs in weeks for pair in pairs]
+            self.assertEqual(len(weeks), size - 1 + size % 2)
+            self.assertEqual(len({frozenset(pair) for pair in pairs}), len(pairs))
+            self.assertEqual(len(pairs), size * (size - 1) // 2)
+            for team in range(size):
+                sides = [
+                    team_a == team
+                    for team_a, team_b in pairs
+                    if team in (team_a, team_b)
+                ]
+                self.assertLessEqual(abs(2 * sum(sides) - len(sides)), 1)
+
+    def test_a_large_league_gets_a_week_for_every_match(self):
+        weeks = round_robin(range(64), double=True)
+        pairs = [pair for pairs in weeks for pair in pairs]
+        found = assign_weeks(
+            [(key, team_a, team_b, None) for key, (team_a, team_b) in enumerate(pairs)],
+            weeks,
+        )
+
+        self.assertEqual(len(found), 64 * 63)
+        self.assertEqual(max(found.values()), 2 * 63)
+        # Every team plays once a week
+        playing = {}
+        for key, week in found.items():
+            for team in pairs[key]:
+                self.assertNotIn(team, playing.setdefault(week, set()))
+                playing[week].add(team)
+        self.assertTrue(all(len(teams) == 64 for teams in playing.values()))
+
+    def test_schedule_assigns_balanced_weeks(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(schedule(1, 1), (0, 10))
+        matches = Match.objects.values_list("week", "team_A_id", "team_B_id")
+        self.assertWeeksAreValid(matches)
+        self.assertEqual(max(week for week, *teams in matches), 5)
+
+    def test_late_team_is_fitted_around_the_scheduled_matches(self):
+        schedule(1, 1)
+        played = Match.objects.order_by("id").first()
+        played.team_A_score = 3
+        played.save()
+        weeks = dict(Match.objects.values_list("id", "week"))
+
+        create_team(self.staff, "Late")
+        self.assertEqual(schedule(1, 1), (0, 5))
+        matches = Match.objects.values_list("id", "week", "team_A_id", "team_B_id")
+        self.assertWeeksAreValid([match[1:] for match in matches])
+        # The bye week of each team is used, without moving any match
+        for match_id, week, *teams in matches:
+            if match_id in weeks:
+                self.assertEqual(week, weeks[match_id])
+        self.assertEqual(max(week for match_id, week, *teams in matches), 5)
+
+    def test_double_round_robin_creates_the_return_matches(self):
+        self.assertEqual(schedule(1, 1, double=True), (10, 20))
+        self.assertEqual(schedule(1, 1, double=True), (0, 0))
+        matches = Match.objects.values_list("week", "team_A_id", "team_B_id")
+        self.assertWeeksAreValid(matches)
+        self.assertEqual(
+            len({(team_a_id, team_b_id) for week, team_a_id, team_b_id in matches}), 20
+        )
+        self.assertEqual(Match.objects.filter(player_stats__isnull=True).count(), 0)
+
+
+class DateSchedulingTestCase(TestCase):
+    def setUp(self):
+        staff = User.objects.create(username="staff")
+        self.teams = [create_team(staff, f"Team {number}") for number in range(4)]
+        schedule(1, 1)
+        self.days = [datetime.date(2023, 6, day) for day in range(1, 8)]
+
+    def test_solver_respects_every_constraint(self):
+        matches = [(key, *pair) for key, pair in enumerate(((1, 2), (3, 4), (1, 3)))]
+        slots = [("first", self.days[0], 1), ("second", self.days[1], 2)]
+        placement, violations = solve(matches, slots, unavailable={4: [self.days[0]]})
+
+        self.assertEqual(violations, 0)
+        self.assertEqual(placement, {0: "second", 1: "second", 2: "first"})
+
+    def test_solver_moves_a_match_to_make_room(self):
+        matches = [(0, 1, 2), (1, 3, 4)]
+        slots = [("first", self.days[0], 1), ("second", self.days[1], 1)]
+        placement, violations = solve(matches, slots, unavailable={3: [self.days[1]]})
+
+        self.assertEqual(violations, 0)
+        self.assertEqual(placement, {0: "second", 1: "first"})
+
+    def test_solver_counts_the_constraints_it_cannot_meet(self):
+        matches = [(0, 1, 2), (1, 1, 3)]
+        slots = [("only", self.days[0], 1)]
+        placement, violations = solve(matches, slots, busy={3: [self.days[0]]})
+
+        # The second match breaks both the capacity and the busy day of team 3
+        self.assertEqual(len(placement), 2)
+        self.assertEqual(violations, 3)
+
+    def test_solver_places_a_season_without_breaking_constraints(self):
+        teams = list(range(30))
+        weeks = round_robin(teams, double=True)
+        matches = [
+            (key, *pair)
+            for key, pair in enumerate(pair for pairs in weeks for pair in pairs)
+        ]
+        days = [
+            datetime.date(2023, 1, 1) + datetime.timedelta(days) for days in range(90)
+        ]
+        slots = [(key, day, 10) for key, day in enumerate(days)]
+        unavailable = {team: days[team::7] for team in teams}
+
+        placement, violations = solve(matches, slots, unavailable)
+        self.assertEqual((len(placement), violations), (len(matches), 0))
+        # Each slot keeps to its capacity, and each team plays once a day, on a
+        # day it is available
+        playing = {}
+        for key, team_a, team_b in matches:
+            day = days[placement[key]]
+            for team in (team_a, team_b):
+                self.assertNotIn(day, unavailable[team])
+                self.assertNotIn(team, playing.setdefault(day, []))
+                playing[day].append(team)
+        self.assertLessEqual(max(len(teams) for teams in playing.values()), 2 * 10)
+
+    def test_matches_are_placed_with_one_bulk_update(self):
+        for day in self.days[:3]:
+            Slot.objects.create(date=day, capacity=2)
+        Unavailability.objects.create(team=self.teams[0], date=self.days[0])
+        played = Match.objects.order_by("id").first()
+        played.team_A_score = 3
+        played.save()
+
+        # Matches, slots, other matches of the teams, unavailabilities, update
+        with self.assertNumQueries(5):
+            placed, violations, elapsed = schedule_dates(Match.objects.all())
+        self.assertEqual((placed, violations), (5, 0))
+
+        self.assertIsNone(Match.objects.get(pk=played.pk).slot)
+        days = {}
+        for match in Match.objects.exclude(pk=played.pk).select_related("slot"):
+            self.assertEqual(match.date, match.slot.date)
+            for team_id in (match.team_A_id, match.team_B_id):
+                self.assertNotIn(match.date, days.setdefault(team_id, set()))
+                days[team_id].add(match.date)
+        self.assertNotIn(self.days[0], days[self.teams[0].id])
+
+    def test_scheduling_again_with_nothing_left_to_place(self):
+        for day in self.days[:3]:
+            Slot.objects.create(date=day, capacity=2)
+        unplaced = Match.objects.filter(slot__isnull=True)
+        self.assertEqual(schedule_dates(unplaced)[0], 6)
+
+        # Only the matches are read when none is left
+        with self.assertNumQueries(1):
+            self.assertEqual(schedule_dates(unplaced), (0, 0, 0.0))
+
+    def test_command_reports_the_violations(self):
+        Slot.objects.create(date=self.days[0])
+        out = StringIO()
+        call_command("schedule_dates", stdout=out)
+        self.assertIn("6 matchs planifiés", out.getvalue())
+        self.assertIn("contraintes non respectées", out.getvalue())
+
+
+class StandingTestCase(TestCase):
+    def setUp(self):
+        staff = User.objects.create(username="staff")
+        self.teams = [create_team(staff, f"Team {number}") for number in range(4)]
+
+    def standings(self, league=1):
+        return list(
+            Standing.objects.filter(league=league).values_list("team__name", "position")
+        )
+
+    def test_results_rank_the_league_again(self):
+        self.assertEqual(
+            self.standings(),
+            [("Team 0", 1), ("Team 1", 2), ("Team 2", 3), ("Team 3", 4)],
+        )
+        match = Match.objects.get(
+            Q(team_A=self.teams[3], team_B=self.teams[0])
+            | Q(team_A=self.teams[0], team_B=self.teams[3])
+        )
+        match.team_A_score, match.team_B_score = (3, 0)
+        if match.team_A_id == self.teams[0].id:
+            match.team_A_score, match.team_B_score = (0, 3)
+        match.save()
+
+        standing = Standing.objects.get(position=1)
+        self.assertEqual(standing.team, self.teams[3])
+        self.assertEqual((standing.wins, standing.bo_diff), (1, 3))
+        self.assertEqual(self.standings()[-1], ("Team 0", 4))
+
+    def test_a_team_moves_to_the_standings_of_its_new_league(self):
+        match = Match.objects.get(
+            Q(team_A=self.teams[1], team_B=self.teams[2])
+            | Q(team_A=self.teams[2], team_B=self.teams[1])
+        )
+        match.team_A_score = 3
+        match.save()
+
+        self.teams[1].league = 2
+        self.teams[1].save()
+        self.assertEqual(self.standings(2), [("Team 1", 1)])
+        self.assertEqual(
+            self.standings(), [("Team 0", 1), ("Team 2", 2), ("Team 3", 3)]
+        )
+
+    def test_deleting_a_team_closes_the_gap(self):
+        self.teams[0].delete()
+        self.assertEqual([position for name, position in self.standings()], [1, 2, 3])
+
+    def test_deferred_results_rank_the_league_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with stats.deferred_stats():
+                for match in Match.objects.filter(team_A=self.teams[2]):
+                    match.team_A_score = 3
+                    match.save()
+                self.assertEqual(Standing.objects.get(team=self.teams[2]).position, 3)
+        self.assertEqual(Standing.objects.get(team=self.teams[2]).position, 1)
+
+
+class TiebreakTestCase(SimpleTestCase):
+    def teams(self, *counters):
+        return [
+            Team(id=pk, wins=wins, lose=lose, bo_diff=bo_diff, bo_wins=5, bo_lose=5)
+            for pk, (wins, lose, bo_diff) in enumerate(counters, 1)
+        ]
+
+    def test_head_to_head_wins_break_a_tie(self):
+        teams = self.teams((2, 1, 0), (2, 1, 0), (3, 0, 4))
+        matrix = head_to_head([(1, 2, 1, 3), (3, 1, 3, 0)])
+        self.assertEqual([team.id for team in rank(teams, matrix)], [3, 2, 1])
+
+    def test_remaining_ties_are_resolved_recursively(self):
+        # 1 beats everyone, 4 loses closest to it, then 2 and 3 are still tied on
+        # the mini-league of the four and their own match decides
+        teams = self.teams(*[(3, 3, 0)] * 4)
+        matrix = head_to_head(
+            [
+                (1, 2, 3, 0),
+                (1, 3, 3, 0),
+                (1, 4, 3, 2),
+                (3, 2, 3, 0),
+                (2, 4, 3, 0),
+                (4, 3, 3, 0),
+            ]
+        )
+        self.assertEqual([team.id for team in rank(teams, matrix)], [1, 4, 3, 2])
+
+    def test_teams_that_never_met_fall_back_on_the_bo_won(self):
+        teams = self.teams((1, 0, 2), (1, 0, 2))
+        teams[1].bo_wins = 6
+        self.assertEqual([team.id for team in rank(teams, {})], [2, 1])
+
+    def test_a_twelve_team_tie_is_ranked_in_memory_by_head_to_head_wins(self):
+        teams = self.teams(*[(5, 6, 0)] * 12)
+        results = [
+            (team_a, team_b, 3, 2)
+            for week in round_robin(range(1, 13))
+            for team_a, team_b in week
+        ]
+        matrix = head_to_head(results)
+        wins = dict.fromkeys(range(1, 13), 0)
+        for team_a, team_b, score_a, score_b in results:
+            wins[team_a] += 1
+
+        # A SimpleTestCase, which refuses any query
+        ranking = [team.id for team in rank(teams, matrix)]
+        self.assertEqual(sorted(ranking), list(range(1, 13)))
+        self.assertEqual(
+            [wins[pk] for pk in ranking], sorted(wins.values(), reverse=True)
+        )
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff", is_staff=True)
+        self.teams = [create_team(self.staff, f"Team {number}") for number in range(3)]
+        self.match = Match.objects.order_by("id").first()
+        self.match.team_B_score = 3
+        self.match.save()
+        self.match.player_stats.filter(side="B", slot=1).update(goals=4)
+
+    def test_the_export_streams_one_line_per_player_per_match(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("export_player_stats"), {"split": 1})
+        self.assertTrue(response.streaming)
+        lines = list(
+            csv.DictReader(b"".join(response.streaming_content).decode().splitlines())
+        )
+        self.assertEqual(len(lines), 3 * 6)
+        line = next(
+            line
+            for line in lines
+            if line["match_id"] == str(self.match.id) and line["goals"] == "4"
+        )
+        self.assertEqual(line["team"], self.match.team_B.name)
+        self.assertEqual(line["opponent"], self.match.team_A.name)
+        self.assertEqual((line["team_score"], line["opponent_score"]), ("3", "0"))
+
+    def test_the_export_is_for_staff_only(self):
+        response = self.client.get(reverse("export_player_stats"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_the_admin_exports_the_selected_matches(self):
+        self.staff.is_superuser = True
+        self.staff.save()
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            reverse("admin:results_match_changelist"),
+            {"action": "export_player_stats", "_selected_action": [self.match.id]},
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1 + 6)
+
+    def test_the_command_writes_csv_or_needs_pyarrow_for_parquet(self):
+        out = StringIO()
+        call_command("export_player_stats", "--league", "1", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1 + 3 * 6)
+
+        if importlib.util.find_spec("pyarrow") is None:
+            with self.assertRaisesMessage(CommandError, "pyarrow"):
+                call_command(
+                    "export_player_stats", "--format", "parquet", "--output", "x"
+                )
+
+
+class ImportResultsTestCase(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username="staff")
+        self.teams = [create_team(self.staff, f"Team {number}") for number in range(8)]
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def sheet(self, lines, name="sheet.csv"):
+        path = self.directory / name
+        if path.suffix == ".json":
+            path.write_text(json.dumps(lines))
+        else:
+            with path.open("w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=COLUMNS)
+                writer.writeheader()
+                writer.writerows(lines)
+        return str(path)
+
+    def week(self):
+        # The export of every match, each won 3-1 by team A with a goal per player
+        lines = [dict(zip(COLUMNS, row)) for row in player_stat_rows()]
+        for line in lines:
+            won = line["side"] == "A"
+            line["team_score"], line["opponent_score"] = (3, 1) if won else (1, 3)
+            line["goals"] = 1
+        return lines
+
+    def test_a_week_is_imported_at_once(self):
+        path = self.sheet(self.week())
+        self.assertEqual(Match.objects.count(), 28)
+
+        # A fixed number of queries, not a few per match
+        with self.assertNumQueries(18):
+            call_command("import_results", path, stdout=StringIO())
+
+        self.assertFalse(Match.objects.filter(UNPLAYED).exists())
+        incremental = counters()
+        recompute()
+        self.assertEqual(incremental, counters())
+        self.assertEqual(
+            dict(Standing.objects.values_list("team_id", "wins")),
+            dict(Team.objects.values_list("id", "wins")),
+        )
+
+    def test_a_dry_run_only_reports_the_differences(self):
+        lines = self.week()[:6]
+        out = StringIO()
+        with self.assertNumQueries(3):
+            call_command(
+                "import_results",
+                self.sheet(lines, "sheet.json"),
+                "--dry-run",
+                stdout=out,
+            )
+        self.assertIn("0-0 → 3-1", out.getvalue())
+        self.assertIn("goals 0 → 1", out.getvalue())
+        self.assertFalse(Match.objects.exclude(UNPLAYED).exists())
+
+    def test_a_substitute_replaces_the_player_of_the_slot(self):
+        substitute = Player.objects.create(name="Sub", tracker="https://sub", split=1)
+        lines = self.week()[:6]
+        lines[0]["player"] = "https://sub"
+        call_command("import_results", self.sheet(lines), stdout=StringIO())
+
+        row = MatchPlayerStat.objects.get(
+            match_id=lines[0]["match_id"], side="A", slot=1
+        )
+        self.assertEqual((row.player, row.goals), (substitute, 1))
+        self.assertEqual(Player.objects.get(pk=substitute.pk).goals, 1)
+
+    def test_a_sheet_with_errors_is_refused_as_a_whole(self):
+        lines = self.week()[:12]
+        lines[1]["player"] = "Nobody"
+        lines[4]["team_score"] = 2
+        with self.assertRaises(CommandError) as error:
+            call_command("import_results", self.sheet(lines), stdout=StringIO())
+        self.assertIn("Ligne 2 : joueur inconnu : Nobody.", str(error.exception))
+        self.assertIn("Ligne 5 : le score", str(error.exception))
+        self.assertFalse(Match.objects.exclude(UNPLAYED).exists())
+
+
+class StandingsViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # The split is read once per process, not by each request
+        current_split()
+        staff = User.objects.create(username="staff")
+        for league in (1, 2, 3):
+            for number in range(7):
+                create_team(staff, f"Team {league}{number}", league=league)
+        Team.objects.filter(name__endswith="6").update(wins=5)
+        refresh_standings(Team.objects.values_list("id", flat=True))
+
+    def test_standings_use_one_query_whatever_the_number_of_leagues(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("standings"))
+
+        leagues = response.context["teams_by_league"]
+        self.assertEqual([league["league"] for league in leagues], [1, 2, 3])
+        first = leagues[1]["standings"][0]
+        self.assertEqual(
+            (first.team.name, first.position, first.zone),
+            ("Team 26", 1, "table-success"),
+        )
+        self.assertEqual(
+            [standing.zone for standing in leagues[0]["standings"]][5:],
+            ["table-warning", "table-danger"],
+        )
+        self.assertContains(response, '<tr class="table-danger">', count=1 + 2 + 1)
+
+
+class CalendarViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # The split is read once per process, not by each request
+        current_split()
+        staff = User.objects.create(username="staff")
+        for league in (1, 2, 3):
+            for number in range(4):
+                create_team(staff, f"Team {league}{number}", league=league)
+            schedule(league, 1)
+
+    def test_calendar_uses_one_query_whatever_the_number_of_leagues(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("calendar"))
+
+        leagues = response.context["matches"]
+        self.assertEqual([league["league"] for league in leagues], [1, 2, 3])
+        for league in leagues:
+            self.assertEqual(len(league["match"]), 6)
+            weeks = [match.week for match in league["match"]]
+            self.assertEqual(weeks, sorted(weeks))
+        self.assertContains(response, "Team 10")
+
+
+class PageCacheTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        staff = User.objects.create(username="staff")
+        for number in range(4):
+            create_team(staff, f"Team {number}")
+
+    def wait_for_prewarm(self):
+        for thread in threading.enumerate():
+            if thread.name == "pages-prewarm":
+                thread.join(5)
+
+    def test_cached_pages_do_not_touch_the_database(self):
+        pages.prewarm()
+        for name in pages.PAGES:
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse(name))
+            self.assertContains(response, "Team 3")
+
+    def test_saving_data_bumps_the_version_once_and_prewarms_the_pages(self):
+        version, modified = pages.version()
+        with mock.patch.object(settings, "PAGES_PREWARM_DELAY", 0):
+            with transaction.atomic():
+                Team.objects.filter(name="Team 0").update(name="Renamed")
+                Player.objects.filter(name="Team 0 1").update(name="Renamed 1")
+                Team.objects.get(name="Renamed").save()
+                Match.objects.first().save()
+            self.assertEqual(pages.version()[0], version + 1)
+            self.wait_for_prewarm()
+
+        for name in pages.PAGES:
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse(name))
+            self.assertContains(response, "Renamed")
+
+    def test_autocommit_saves_leave_the_rendering_to_one_background_thread(self):
+        rendered = []
+        with mock.patch.object(settings, "PAGES_PREWARM_DELAY", 0.5), mock.patch.object(
+            pages, "prewarm", lambda: rendered.append(pages.version())
+        ):
+            for team in Team.objects.all():
+                team.save()
+            self.assertEqual(rendered, [])
+            self.wait_for_prewarm()
+        # Once, from the version of the last save
+        self.assertEqual(rendered, [pages.version()])
+
+    def test_nothing_is_invalidated_when_the_transaction_fails(self):
+        version, modified = pages.version()
+        with self.assertRaises(ValueError), transaction.atomic():
+            Team.objects.first().save()
+            raise ValueError
+        self.assertEqual(pages.version()[0], version)
+
+    def test_pages_carry_validators_and_proxy_caching(self):
+        response = self.client.get(reverse("standings"))
+        self.assertTrue(response["ETag"])
+        self.assertTrue(response["Last-Modified"])
+        self.assertIn("s-maxage=300", response["Cache-Control"])
+        self.assertIn("max-age=0", response["Cache-Control"])
+
+    def test_unchanged_pages_are_answered_with_not_modified(self):
+        response = self.client.get(reverse("teams"))
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(
+                reverse("teams"), HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+        not_modified = self.client.get(
+            reverse("teams"), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+        Team.objects.first().save()
+        changed = self.client.get(reverse("teams"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+
+    def test_changes_are_announced_with_the_page_paths(self):
+        sent = []
+
+        def listener(sender, paths, **kwargs):
+            sent.append(paths)
+
+        pages.pages_changed.connect(listener)
+        self.addCleanup(pages.pages_changed.disconnect, listener)
+        Team.objects.first().save()
+        self.assertEqual(sent, [[reverse(name) for name in pages.PAGES]])
+
+    def test_the_proxy_is_purged_without_holding_up_the_save(self):
+        release, done = threading.Event(), threading.Event()
+        purged = []
+
+        def urlopen(request, timeout):
+            # A proxy that does not answer
+            release.wait(5)
+            purged.append((request.get_method(), request.full_url))
+            if len(purged) == len(pages.PAGES):
+                done.set()
+            return mock.MagicMock()
+
+        with mock.patch.object(
+            settings, "PAGES_PURGE_URL", "http://proxy/"
+        ), mock.patch.object(pages, "urlopen", urlopen):
+            # The save returns while the proxy still holds every request
+            Team.objects.first().save()
+            self.assertEqual(purged, [])
+
+            release.set()
+            done.wait(5)
+        self.assertEqual(
+            purged, [("PURGE", "http://proxy" + reverse(name)) for name in pages.PAGES]
+        )
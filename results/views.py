@@ -1,13 +1,22 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from results.models import Match
-from results.models import Team
+from results.models import Standing
+from results.exports import csv_lines, player_stat_rows
+from results.standings import COUNTERS
 from django.db.models import F
-from interligue import settings
+from configuration.split import current_split
+from interligue.pages import cached_page
 
 
+@cached_page("standings")
 def standings(request):
     """Renders the standings page.
 
+    The standings of the split are read already ranked, with the names of the
+    teams, in one query.
+
     Args:
         request (HttpRequest): The HTTP request object.
 
@@ -16,35 +25,32 @@ def standings(request):
 
     """
 
-    # Get a list of all distinct leagues in the database
-    leagues = (
-        Team.objects.values_list("league", flat=True)
-        .order_by("league")
-        .filter(split=settings.split)
-        .distinct()
-    )
+    standings = Standing.objects.filter(split=current_split()).select_related("team")
 
-    # Create an empty list to store the teams in each league
-    teams_by_league = []
-
-    # Loop through each league and get a queryset of all teams in that league,
-    # sorted by various criteria
-    for league in leagues:
-        teams = Team.objects.filter(league=league, split=settings.split).order_by(
-            "-wins", "lose", "-bo_diff", "-bo_wins", "bo_lose"
-        )
-        # Add the league name and the teams in that league to the list of teams by league
-        teams_by_league.append({"league": league, "teams": teams})
+    # Group the standings by league
+    leagues = {}
+    for standing in standings.only(
+        "league", "position", "zone", *COUNTERS, "team__name"
+    ):
+        leagues.setdefault(standing.league, []).append(standing)
+    teams_by_league = [
+        {"league": league, "standings": standings}
+        for league, standings in leagues.items()
+    ]
 
     # Create a dictionary containing the list of teams by league and render the standings page
     context = {"teams_by_league": teams_by_league}
     return render(request, "standings.html", context)
 
 
+@cached_page("calendar")
 def calendar(request):
     """
     Renders a page with a calendar of upcoming matches, grouped by league.
 
+    The matches of the split and the names of their teams are read with one
+    query, then grouped by league in memory.
+
     Args:
         request (HttpRequest): The HTTP request object.
 
@@ -52,22 +58,58 @@ def calendar(request):
         HttpResponse: A response containing the rendered HTML template.
     """
 
-    # Get a list of all the distinct leagues in the database
-    leagues = (
-        Match.objects.order_by("league")
-        .values_list("league", flat=True)
-        .filter(split=settings.split)
-        .distinct()
+    # Get the matches ordered by league, then by week and date, ignoring null values
+    matches = (
+        Match.objects.filter(split=current_split())
+        .select_related("team_A", "team_B")
+        .only(
+            "league",
+            "week",
+            "date",
+            "team_A_score",
+            "team_B_score",
+            "team_A__name",
+            "team_B__name",
+        )
+        .order_by(
+            "league", F("week").asc(nulls_last=True), F("date").asc(nulls_last=True)
+        )
     )
 
-    # Group all the matches by league and order them by week, ignoring null values
-    matches = []
-    for league in leagues:
-        match = Match.objects.filter(league=league, split=settings.split).order_by(
-            F("week").asc(nulls_last=True), F("date").asc(nulls_last=True)
-        )
-        matches.append({"league": league, "match": match})
+    # Group the matches by league
+    leagues = {}
+    for match in matches:
+        leagues.setdefault(match.league, []).append(match)
+    matches = [{"league": league, "match": match} for league, match in leagues.items()]
 
     # Render the template with the matches grouped by league
     context = {"matches": matches}
     return render(request, "calendar.html", context)
+
+
+@staff_member_required
+def export_player_stats(request):
+    """
+    Streams the statistics of every player of every match as a CSV file.
+
+    The lines are written as the rows are read from the database, so that the
+    whole export is never held in memory.
+
+    Args:
+        request (HttpRequest): The HTTP request object, which can filter on `split`
+            and `league`.
+
+    Returns:
+        StreamingHttpResponse: The CSV file.
+    """
+
+    filters = {}
+    for name in ("split", "league"):
+        if request.GET.get(name, "").isdigit():
+            filters[name] = int(request.GET[name])
+
+    response = StreamingHttpResponse(
+        csv_lines(player_stat_rows(**filters)), content_type="text/csv"
+    )
+    response["Content-Disposition"] = 'attachment; filename="statistiques.csv"'
+    return response
@@ -1,7 +1,36 @@
 from django.contrib import admin
 
+from teams.forms import TeamMembershipFormSet
 from teams.models import Team
 from teams.models import Player
+from teams.models import TeamMembership, active_memberships
+
+
+class TeamMembershipInline(admin.TabularInline):
+    """
+    Inline interface for editing the current players of a team.
+
+    Args:
+        model (Model): The model edited by the inline.
+        formset (BaseInlineFormSet): The formset validating the composition.
+        fields (tuple): The fields to display for each player.
+    """
+
+    model = TeamMembership
+    formset = TeamMembershipFormSet
+    fields = ("slot", "player", "joined", "left")
+    extra = 0
+    min_num = 3
+    max_num = 5
+
+    def get_queryset(self, request):
+        # Former players are kept for history but not edited from the team
+        return (
+            super()
+            .get_queryset(request)
+            .filter(left__isnull=True)
+            .select_related("player")
+        )
 
 
 class TeamAdmin(admin.ModelAdmin):
@@ -14,6 +43,7 @@ class TeamAdmin(admin.ModelAdmin):
         search_fields (tuple): The fields to use for searching `Team` objects.
         readonly_fields (tuple): The fields that should be displayed as read-only in the detail view of `Team` objects.
         fieldsets (tuple): The sections and fields to display in the detail view of `Team` objects.
+        inlines (tuple): The players of the team, edited in the detail view.
     """
 
     list_display = (
@@ -52,11 +82,6 @@ class TeamAdmin(admin.ModelAdmin):
                     "split",
                     "league",
                     "staff",
-                    "player1",
-                    "player2",
-                    "player3",
-                    "player4",
-                    "player5",
                 ),
             },
         ),
@@ -79,6 +104,7 @@ class TeamAdmin(admin.ModelAdmin):
             },
         ),
     )
+    inlines = (TeamMembershipInline,)
 
 
 class PlayerAdmin(admin.ModelAdmin):
@@ -107,6 +133,12 @@ class PlayerAdmin(admin.ModelAdmin):
     ordering = ("name", "score", "goals", "saves", "assists", "shots")
     readonly_fields = ("score", "goals", "saves", "assists", "shots")
 
+    def get_queryset(self, request):
+        # Load the team of every player of the list at once
+        return (
+            super().get_queryset(request).prefetch_related(active_memberships("team"))
+        )
+
 
 admin.site.register(Team, TeamAdmin)
 admin.site.register(Player, PlayerAdmin)
@@ -0,0 +1,89 @@
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import BaseInlineFormSet
+
+from teams.models import TeamMembership
+
+
+class TeamMembershipFormSet(BaseInlineFormSet):
+    """
+    Formset of the current players of a team.
+
+    The database constraints of `TeamMembership` guarantee the roster; this formset
+    only turns their violations into readable errors, with a single query.
+    """
+
+    def save_existing_objects(self, commit=True):
+        """
+        Saves the changed memberships of the team.
+
+        The changed and deleted memberships are first marked as left, so that two
+        players can swap their slots, or a player take the slot of another one, in
+        a single submit without meeting the constraints halfway.
+        """
+
+        if not commit:
+            return super().save_existing_objects(commit)
+        changed = [
+            form.instance.pk
+            for form in self.initial_forms
+            if form.instance.pk is not None and form.has_changed()
+        ]
+        with transaction.atomic():
+            TeamMembership.objects.filter(pk__in=changed).update(
+                left=datetime.date.today()
+            )
+            return super().save_existing_objects(commit)
+
+    def clean(self):
+        """
+        Validates the team composition.
+
+        Raises a ValidationError if any of the following conditions are met:
+            - a player appears twice in the team composition
+            - two players share the same slot
+            - a player is already part of another team's composition
+            - the team has fewer than 3 players
+        """
+
+        super().clean()
+        if any(self.errors):
+            return
+
+        # The players who stay in the team once the formset is saved
+        memberships = [
+            form.cleaned_data
+            for form in self.forms
+            if form.cleaned_data
+            and not form.cleaned_data.get("DELETE")
+            and form.cleaned_data.get("left") is None
+        ]
+
+        players, slots = set(), set()
+        for membership in memberships:
+            player, slot = membership["player"], membership["slot"]
+            if player in players:
+                raise ValidationError(
+                    f"Le joueur {player} apparaît deux fois dans la composition de l'équipe."
+                )
+            if slot in slots:
+                raise ValidationError(f"Le poste {slot} est attribué deux fois.")
+            players.add(player)
+            slots.add(slot)
+
+        if len(players) < 3:
+            raise ValidationError("Une équipe doit compter au moins 3 joueurs.")
+
+        # Check that no player appears in the composition of another team
+        taken = (
+            TeamMembership.objects.filter(player__in=players, left__isnull=True)
+            .exclude(team=self.instance.pk)
+            .select_related("player")
+            .first()
+        )
+        if taken is not None:
+            raise ValidationError(
+                f"Le joueur {taken.player} a déjà une équipe attribuée."
+            )
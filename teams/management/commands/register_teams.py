@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from configuration.split import current_split
+from teams.registrations import RegistrationError, read_registrations, register_teams
+
+
+class Command(BaseCommand):
+    help = "Inscrit les équipes et les joueurs d'une feuille d'inscription CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Feuille d'inscription, en .csv.")
+        parser.add_argument(
+            "--split",
+            type=int,
+            help="Split des équipes dont la ligne n'en donne pas, le split actuel "
+            "par défaut.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            lines = read_registrations(options["file"])
+            teams, players, matches = register_teams(
+                lines, options["split"] or current_split()
+            )
+        except OSError as error:
+            raise CommandError(f"Impossible de lire {options['file']} : {error}")
+        except RegistrationError as error:
+            raise CommandError(f"Inscriptions refusées :\n{error}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{teams} équipes, {players} joueurs et {matches} matchs créés "
+                f"en {time.perf_counter() - start:.2f} s."
+            )
+        )
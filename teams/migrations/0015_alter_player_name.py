@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0014_delete_configuration'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='player',
+            name='name',
+            field=models.CharField(max_length=50),
+        ),
+    ]
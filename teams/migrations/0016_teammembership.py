@@ -0,0 +1,58 @@
+# Generated by Django 3.2.8 on 2026-10-18 06:40
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+import interligue.tracking
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0015_alter_player_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='team',
+            name='player1',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='team_player1', to='teams.player'),
+        ),
+        migrations.AlterField(
+            model_name='team',
+            name='player2',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='team_player2', to='teams.player'),
+        ),
+        migrations.AlterField(
+            model_name='team',
+            name='player3',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='team_player3', to='teams.player'),
+        ),
+        migrations.CreateModel(
+            name='TeamMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.IntegerField(choices=[(1, 'Joueur 1'), (2, 'Joueur 2'), (3, 'Joueur 3'), (4, 'Joueur 4'), (5, 'Joueur 5')])),
+                ('joined', models.DateField(default=datetime.date.today)),
+                ('left', models.DateField(blank=True, null=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='teams.player')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='teams.team')),
+            ],
+            options={
+                'ordering': ('slot',),
+            },
+            bases=(interligue.tracking.FieldTracker, models.Model),
+        ),
+        migrations.AddConstraint(
+            model_name='teammembership',
+            constraint=models.UniqueConstraint(condition=models.Q(('left__isnull', True)), fields=('player',), name='unique_active_membership'),
+        ),
+        migrations.AddConstraint(
+            model_name='teammembership',
+            constraint=models.UniqueConstraint(condition=models.Q(('left__isnull', True)), fields=('team', 'slot'), name='unique_active_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='teammembership',
+            constraint=models.CheckConstraint(check=models.Q(('slot__gte', 1), ('slot__lte', 5)), name='membership_slot_range'),
+        ),
+    ]
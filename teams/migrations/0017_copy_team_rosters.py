@@ -0,0 +1,52 @@
+from django.db import migrations
+
+
+SLOTS = range(1, 6)
+
+
+def copy_to_memberships(apps, schema_editor):
+    """
+    Creates one TeamMembership row per player slot filled in a team.
+    """
+
+    Team = apps.get_model("teams", "Team")
+    TeamMembership = apps.get_model("teams", "TeamMembership")
+
+    memberships = []
+    for team in Team.objects.iterator():
+        for slot in SLOTS:
+            player_id = getattr(team, f"player{slot}_id")
+            if player_id is not None:
+                memberships.append(
+                    TeamMembership(team_id=team.id, player_id=player_id, slot=slot)
+                )
+    TeamMembership.objects.bulk_create(memberships, batch_size=500)
+
+
+def copy_to_columns(apps, schema_editor):
+    """
+    Writes the current memberships back into the player columns of the teams.
+    """
+
+    Team = apps.get_model("teams", "Team")
+    TeamMembership = apps.get_model("teams", "TeamMembership")
+
+    teams = {}
+    for membership in TeamMembership.objects.filter(left__isnull=True).iterator():
+        teams.setdefault(membership.team_id, {})[
+            f"player{membership.slot}_id"
+        ] = membership.player_id
+
+    for team_id, values in teams.items():
+        Team.objects.filter(id=team_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("teams", "0016_teammembership"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_to_memberships, copy_to_columns),
+    ]
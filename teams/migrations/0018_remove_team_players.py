@@ -0,0 +1,33 @@
+# Generated by Django 3.2.8 on 2026-10-18 06:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0017_copy_team_rosters'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='team',
+            name='player1',
+        ),
+        migrations.RemoveField(
+            model_name='team',
+            name='player2',
+        ),
+        migrations.RemoveField(
+            model_name='team',
+            name='player3',
+        ),
+        migrations.RemoveField(
+            model_name='team',
+            name='player4',
+        ),
+        migrations.RemoveField(
+            model_name='team',
+            name='player5',
+        ),
+    ]
@@ -1,7 +1,15 @@
+from contextlib import contextmanager
+import datetime
+import threading
+
 from django.db import models
-from django.db.models import Q
+from django.db.models import Case, F, Prefetch, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from authentication.models import User
-from django.core.exceptions import ValidationError
+from interligue.tracking import FieldTracker
+
+# Statistics recorded for each player of a match
+STATS = ("score", "goals", "assists", "saves", "shots")
 
 
 class Player(models.Model):
@@ -22,17 +30,15 @@ class Player(models.Model):
             Team: The team the player belongs to, or None if the player does not belong to any team.
         """
 
-        try:
-            team = Team.objects.get(
-                Q(player1=self)
-                | Q(player2=self)
-                | Q(player3=self)
-                | Q(player4=self)
-                | Q(player5=self)
-            )
-            return team
-        except Team.DoesNotExist:
-            return None
+        # Use the memberships loaded by `active_memberships("team")` if any
+        memberships = getattr(self, "active_members", None)
+        if memberships is None:
+            memberships = TeamMembership.objects.filter(
+                player=self, left__isnull=True
+            ).select_related("team")[:1]
+        for membership in memberships:
+            return membership.team
+        return None
 
     get_team.short_description = "Team"
 
@@ -48,58 +54,14 @@ class Player(models.Model):
         - shots
         """
 
-        # Import the Match model from the results app
-        from results.models import Match
+        # Import the MatchPlayerStat model from the results app
+        from results.models import MatchPlayerStat
 
-        # Retrieve all the matches in which the player has participated
-        matches = Match.objects.filter(
-            Q(team_A_player_1=self)
-            | Q(team_A_player_2=self)
-            | Q(team_A_player_3=self)
-            | Q(team_A_player_4=self)
-            | Q(team_A_player_5=self)
-            | Q(team_B_player_1=self)
-            | Q(team_B_player_2=self)
-            | Q(team_B_player_3=self)
-            | Q(team_B_player_4=self)
-            | Q(team_B_player_5=self)
+        # Add up the player's statistics over all the matches they played
+        player_stats = MatchPlayerStat.objects.filter(player=self).aggregate(
+            **{stat: Coalesce(Sum(stat), 0) for stat in STATS}
         )
 
-        # Define a list of player fields for each team in a match
-        player_fields = [
-            "team_A_player_1",
-            "team_A_player_2",
-            "team_A_player_3",
-            "team_A_player_4",
-            "team_A_player_5",
-            "team_B_player_1",
-            "team_B_player_2",
-            "team_B_player_3",
-            "team_B_player_4",
-            "team_B_player_5",
-        ]
-
-        # Initialize a dictionary to store the player's statistics
-        player_stats = {
-            "score": 0,
-            "goals": 0,
-            "assists": 0,
-            "saves": 0,
-            "shots": 0,
-        }
-
-        # Iterate over each match in which the player participated
-        for match in matches:
-            # Iterate over each player field in a match
-            for player_field in player_fields:
-                # Retrieve the player from the player field
-                player = getattr(match, player_field)
-                # Check if the player exists and is the same as the current player
-                if player is not None and player.id == self:
-                    # Iterate over each statistic and add it to the player's stats dictionary
-                    for stat in player_stats:
-                        player_stats[stat] += getattr(match, (f"{player_field}_{stat}"))
-
         # Update the player's stats in the database
         Player.objects.filter(id=self).update(**player_stats)
 
@@ -107,7 +69,53 @@ class Player(models.Model):
         return self.name
 
 
-class Team(models.Model):
+_deleting = threading.local()
+
+
+@contextmanager
+def deleting(team_ids):
+    """
+    Context manager inside which teams are known to be deleted.
+
+    Their memberships are deleted along with them, so that the matches, deleted
+    too, must not be updated for each of them.
+
+    Args:
+        team_ids (iterable): The ids of the teams about to be deleted.
+    """
+
+    if not hasattr(_deleting, "ids"):
+        _deleting.ids = set()
+    ids = set(team_ids) - _deleting.ids
+    _deleting.ids.update(ids)
+    try:
+        yield
+    finally:
+        _deleting.ids.difference_update(ids)
+
+
+def is_deleting(team_id):
+    """
+    Tells whether a team is being deleted, inside `deleting`.
+
+    Args:
+        team_id (int): The id of the team.
+
+    Returns:
+        bool: True if the team is being deleted.
+    """
+
+    return team_id in getattr(_deleting, "ids", ())
+
+
+class TeamQuerySet(models.QuerySet):
+    def delete(self):
+        # The teams are only known once the query is run
+        with deleting(list(self.values_list("pk", flat=True))):
+            return super().delete()
+
+
+class Team(FieldTracker, models.Model):
     name = models.CharField(max_length=50, null=False, blank=False)
     number = models.IntegerField(default=1, null=False, blank=False)
     acronym = models.CharField(max_length=4, null=False, blank=False)
@@ -128,89 +136,33 @@ class Team(models.Model):
     saves = models.IntegerField(default=0, null=False, blank=False)
     shots = models.IntegerField(default=0, null=False, blank=False)
 
-    player1 = models.OneToOneField(
-        Player,
-        related_name="team_player1",
-        on_delete=models.CASCADE,
-        null=False,
-        blank=False,
-    )
-    player2 = models.OneToOneField(
-        Player,
-        related_name="team_player2",
-        on_delete=models.CASCADE,
-        null=False,
-        blank=False,
-    )
-    player3 = models.OneToOneField(
-        Player,
-        related_name="team_player3",
-        on_delete=models.CASCADE,
-        null=False,
-        blank=False,
-    )
-    player4 = models.OneToOneField(
-        Player,
-        related_name="team_player4",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
-    player5 = models.OneToOneField(
-        Player,
-        related_name="team_player5",
-        on_delete=models.CASCADE,
-        null=True,
-        blank=True,
-    )
+    objects = TeamQuerySet.as_manager()
+
+    def delete(self, *args, **kwargs):
+        with deleting([self.pk]):
+            return super().delete(*args, **kwargs)
 
-    def clean(self):
+    def get_roster(self):
         """
-        Validates the team composition to ensure that it meets the necessary criteria.
+        Returns the players currently in the team.
 
-        Raises a ValidationError if any of the following conditions are met:
-            - a player appears twice in the team composition
-            - a player is already part of another team's composition
+        Uses the memberships loaded by `active_memberships()` when they were
+        prefetched, and one query otherwise.
+
+        Returns:
+            dict: The ids of the players, keyed by slot.
         """
 
-        # Call the parent class's clean method to ensure that it gets run
-        super().clean()
-
-        # Make a list of all the players in the team
-        players = [self.player1, self.player2, self.player3, self.player4, self.player5]
-
-        # Check that no player appears twice in the team composition
-        seen_players = set()
-        for player in players:
-            if player in seen_players:
-                raise ValidationError(
-                    f"Le joueur {player} apparaît deux fois dans la composition de l'équipe."
-                )
-            elif player:
-                seen_players.add(player)
-
-        # Check that no player appears in the composition of another team
-        for i in range(len(players)):
-            player = getattr(self, f"player{i+1}")
-            if (
-                player
-                and Team.objects.exclude(pk=self.pk)
-                .filter(
-                    Q(player1=player)
-                    | Q(player2=player)
-                    | Q(player3=player)
-                    | Q(player4=player)
-                    | Q(player5=player)
-                )
-                .exists()
-            ):
-                raise ValidationError(
-                    f"Le joueur {player} a déjà une équipe attribuée."
-                )
+        memberships = getattr(self, "active_members", None)
+        if memberships is None:
+            memberships = TeamMembership.objects.filter(
+                team=self, left__isnull=True
+            ).only("slot", "player_id")
+        return {membership.slot: membership.player_id for membership in memberships}
 
     def set_statistics(self):
         """
-        Computes and updates the statistics of a team based on the statistics of its players.
+        Computes and updates the statistics of a team based on the statistics of the players who played for it.
 
         The following statistics are computed:
         - score: the total score of the team
@@ -220,29 +172,13 @@ class Team(models.Model):
         - shots: the total number of shots made by the team
         """
 
-        # Initialize dictionary with all keys initialized to 0
-        stats = {
-            "score": 0,
-            "goals": 0,
-            "saves": 0,
-            "assists": 0,
-            "shots": 0,
-        }
-
-        # Iterate through the team's players and add up their stats
-        for player in [
-            self.player1,
-            self.player2,
-            self.player3,
-            self.player4,
-            self.player5,
-        ]:
-            if player is not None:
-                stats["score"] += player.score
-                stats["goals"] += player.goals
-                stats["saves"] += player.saves
-                stats["assists"] += player.assists
-                stats["shots"] += player.shots
+        # Import the MatchPlayerStat model from the results app
+        from results.models import MatchPlayerStat
+
+        # Add up the statistics of the players on the team's side of its matches
+        stats = MatchPlayerStat.objects.filter(
+            Q(side="A", match__team_A=self.id) | Q(side="B", match__team_B=self.id)
+        ).aggregate(**{stat: Coalesce(Sum(stat), 0) for stat in STATS})
 
         # Update the team's stats in the database
         Team.objects.filter(id=self.id).update(**stats)
@@ -263,33 +199,45 @@ class Team(models.Model):
         # Import the Match model from the results app
         from results.models import Match
 
-        # Initialize dictionary with all keys initialized to 0
-        stats = {
-            "wins": 0,
-            "lose": 0,
-            "bo_wins": 0,
-            "bo_lose": 0,
-            "bo_diff": 0,
-            "matches_played": 0,
-        }
-
-        # Iterate through all matches the team has played
-        for match in Match.objects.filter(Q(team_A=self) | Q(team_B=self)):
-            # Add up the BO wins and losses for the team
-            stats["bo_wins"] += (
-                match.team_A_score if match.team_A == self else match.team_B_score
-            )
-            stats["bo_lose"] += (
-                match.team_B_score if match.team_A == self else match.team_A_score
-            )
-
-            # Determine if the team won or lost the match
-            team_win = match.get_team_win()
-            if team_win:
-                if team_win == self:
-                    stats["wins"] += 1
-                else:
-                    stats["lose"] += 1
+        # Scores of the team and of its opponent, whichever side the team played on
+        own_score = Case(
+            When(team_A=self.id, then=F("team_A_score")), default=F("team_B_score")
+        )
+        opponent_score = Case(
+            When(team_A=self.id, then=F("team_B_score")), default=F("team_A_score")
+        )
+
+        # Add up the BO wins and losses and count the matches won and lost
+        stats = Match.objects.filter(Q(team_A=self.id) | Q(team_B=self.id)).aggregate(
+            bo_wins=Coalesce(Sum(own_score), 0),
+            bo_lose=Coalesce(Sum(opponent_score), 0),
+            wins=Coalesce(
+                Sum(
+                    Case(
+                        When(
+                            Q(team_A=self.id, team_A_score__gt=F("team_B_score"))
+                            | Q(team_B=self.id, team_B_score__gt=F("team_A_score")),
+                            then=Value(1),
+                        ),
+                        default=Value(0),
+                    )
+                ),
+                0,
+            ),
+            lose=Coalesce(
+                Sum(
+                    Case(
+                        When(
+                            Q(team_A=self.id, team_A_score__lt=F("team_B_score"))
+                            | Q(team_B=self.id, team_B_score__lt=F("team_A_score")),
+                            then=Value(1),
+                        ),
+                        default=Value(0),
+                    )
+                ),
+                0,
+            ),
+        )
 
         # Calculate the BO difference and matches played for the team
         stats["bo_diff"] = stats["bo_wins"] - stats["bo_lose"]
@@ -300,3 +248,72 @@ class Team(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class TeamMembership(FieldTracker, models.Model):
+    SLOTS = [(slot, f"Joueur {slot}") for slot in range(1, 6)]
+
+    team = models.ForeignKey(
+        Team,
+        related_name="memberships",
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+    )
+    player = models.ForeignKey(
+        Player,
+        related_name="memberships",
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+    )
+    slot = models.IntegerField(choices=SLOTS, null=False, blank=False)
+    joined = models.DateField(default=datetime.date.today, null=False, blank=False)
+    left = models.DateField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("slot",)
+        constraints = [
+            # A player belongs to one team at a time
+            models.UniqueConstraint(
+                fields=("player",),
+                condition=Q(left__isnull=True),
+                name="unique_active_membership",
+            ),
+            # A slot of a team holds one player at a time
+            models.UniqueConstraint(
+                fields=("team", "slot"),
+                condition=Q(left__isnull=True),
+                name="unique_active_slot",
+            ),
+            models.CheckConstraint(
+                check=Q(slot__gte=1, slot__lte=5), name="membership_slot_range"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.team} - {self.player}"
+
+
+def active_memberships(related="player"):
+    """
+    Returns a prefetch of the current memberships of teams or players.
+
+    The memberships are stored in the `active_members` attribute, which
+    `Team.get_roster` and `Player.get_team` read instead of querying.
+
+    Args:
+        related (str): The relation to load with each membership, `player` when
+            prefetching teams and `team` when prefetching players.
+
+    Returns:
+        Prefetch: The prefetch to pass to `prefetch_related`.
+    """
+
+    return Prefetch(
+        "memberships",
+        queryset=TeamMembership.objects.filter(left__isnull=True).select_related(
+            related
+        ),
+        to_attr="active_members",
+    )
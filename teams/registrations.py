@@ -0,0 +1,254 @@
+import csv
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from authentication.models import User
+from teams.models import Player, Team, TeamMembership
+
+# Columns every line of a registration sheet must fill
+COLUMNS = ("team", "acronym", "league", "staff", "player", "tracker")
+
+
+class RegistrationError(Exception):
+    """
+    Raised when registrations cannot be imported, with every problem found.
+    """
+
+    def __init__(self, errors):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def read_registrations(path):
+    """
+    Reads the lines of a registration sheet.
+
+    The sheet is a CSV file with one line per player: `team`, `acronym`, `league`,
+    `staff` (a username), `player` and `tracker`, and optionally `split` and
+    `slot`. The team columns are repeated on every line of its players.
+
+    Args:
+        path (str): The path of the CSV file.
+
+    Returns:
+        list: The lines of the sheet, as dictionaries.
+    """
+
+    # Spreadsheets often save their CSV files with a byte order mark
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        return list(csv.DictReader(file))
+
+
+def register_teams(lines, split):
+    """
+    Creates the teams of a registration sheet, their players and their matches.
+
+    The whole sheet is validated in memory, against a few queries, before anything
+    is written. The players, teams and memberships are then created in bulk, which
+    sends no signal, and the matches of each league are created and scheduled
+    once, when all its teams are there, instead of once per team.
+
+    Players are identified by their tracker: a player already known in the split
+    is reused, unless they already have a team.
+
+    Args:
+        lines (list): The lines of the sheet, as read by `read_registrations`.
+        split (int): The split of the teams whose lines give none.
+
+    Returns:
+        tuple: The number of teams, players and matches created.
+
+    Raises:
+        RegistrationError: If the sheet is invalid.
+    """
+
+    from interligue import pages
+    from results.calendars import schedule
+    from results.models import Match
+    from results.standings import refresh_standings
+
+    errors = []
+    teams = _read_teams(lines, split, errors)
+    splits = {team_split for team_split, name in teams}
+    trackers = {
+        (team_split, player["tracker"])
+        for (team_split, name), team in teams.items()
+        for player in team["players"]
+    }
+
+    # Staff members, teams already registered and players already known, at once
+    staff = User.objects.in_bulk(
+        {team["staff"] for team in teams.values()}, field_name="username"
+    )
+    taken = {
+        key
+        for key in Team.objects.filter(
+            split__in=splits, name__in={name for team_split, name in teams}
+        ).values_list("split", "name")
+        if key in teams
+    }
+    known = {}
+    for player in Player.objects.filter(
+        split__in=splits, tracker__in={tracker for team_split, tracker in trackers}
+    ).annotate(
+        active=Exists(
+            TeamMembership.objects.filter(player=OuterRef("pk"), left__isnull=True)
+        )
+    ):
+        if (player.split, player.tracker) in trackers:
+            known.setdefault((player.split, player.tracker), player)
+
+    for (team_split, name), team in teams.items():
+        if team["staff"] not in staff:
+            errors.append(f"{name} : le membre du staff {team['staff']} n'existe pas.")
+        if (team_split, name) in taken:
+            errors.append(f"{name} : l'équipe est déjà inscrite au split {team_split}.")
+        for player in team["players"]:
+            existing = known.get((team_split, player["tracker"]))
+            if existing is not None and existing.active:
+                errors.append(
+                    f"{name} : le joueur {player['name']} a déjà une équipe attribuée."
+                )
+    if errors:
+        raise RegistrationError(errors)
+
+    leagues = {
+        (team_split, team["league"]) for (team_split, name), team in teams.items()
+    }
+    with transaction.atomic():
+        players = [
+            Player(name=player["name"], tracker=player["tracker"], split=team_split)
+            for (team_split, name), team in teams.items()
+            for player in team["players"]
+            if (team_split, player["tracker"]) not in known
+        ]
+        Player.objects.bulk_create(players, batch_size=500)
+        Team.objects.bulk_create(
+            [
+                Team(
+                    name=name,
+                    acronym=team["acronym"],
+                    split=team_split,
+                    league=team["league"],
+                    staff=staff[team["staff"]],
+                )
+                for (team_split, name), team in teams.items()
+            ],
+            batch_size=500,
+        )
+
+        # The ids are read back, as not every database returns them on insert
+        player_ids = {key: player.id for key, player in known.items()}
+        for pk, player_split, tracker in (
+            Player.objects.filter(
+                split__in=splits,
+                tracker__in={tracker for team_split, tracker in trackers},
+            )
+            .exclude(pk__in=player_ids.values())
+            .values_list("id", "split", "tracker")
+        ):
+            player_ids.setdefault((player_split, tracker), pk)
+        team_ids = {
+            (team_split, name): pk
+            for pk, team_split, name in Team.objects.filter(
+                split__in=splits, name__in={name for team_split, name in teams}
+            ).values_list("id", "split", "name")
+        }
+        TeamMembership.objects.bulk_create(
+            [
+                TeamMembership(
+                    team_id=team_ids[key],
+                    player_id=player_ids[key[0], player["tracker"]],
+                    slot=player["slot"],
+                )
+                for key, team in teams.items()
+                for player in team["players"]
+            ],
+            batch_size=500,
+        )
+
+        # Every pairing of each league, created and given a week at once
+        before = Match.objects.filter(split__in=splits).count()
+        for league_split, league in sorted(leagues):
+            Match.create_matches(Team(split=league_split, league=league))
+            schedule(league, league_split)
+        created = Match.objects.filter(split__in=splits).count() - before
+
+        refresh_standings(groups=leagues)
+        pages.invalidate()
+
+    return len(teams), len(players), created
+
+
+def _read_teams(lines, split, errors):
+    # Groups the lines by team, checking each team and its roster in memory
+    teams = {}
+    trackers = {}
+    for number, line in enumerate(lines, 1):
+        # The CSV reader fills the columns missing from a short line with None
+        missing = [column for column in COLUMNS if line.get(column) is None]
+        if missing:
+            errors.append(f"Ligne {number} : la colonne '{missing[0]}' manque.")
+            continue
+        try:
+            team_split = int(line.get("split") or split)
+            name = line["team"].strip()
+            team = {
+                "acronym": line["acronym"].strip(),
+                "league": int(line["league"]),
+                "staff": line["staff"].strip(),
+            }
+            player = {
+                "name": line["player"].strip(),
+                "tracker": line["tracker"].strip(),
+                "slot": int(line["slot"]) if line.get("slot") else None,
+            }
+        except ValueError:
+            errors.append(f"Ligne {number} : une valeur n'est pas un nombre entier.")
+            continue
+
+        if not name or not team["acronym"] or not player["name"]:
+            errors.append(f"Ligne {number} : l'équipe ou le joueur n'a pas de nom.")
+            continue
+        if len(name) > 50 or len(team["acronym"]) > 4 or len(player["name"]) > 50:
+            errors.append(f"Ligne {number} : un nom ou un acronyme est trop long.")
+            continue
+        if not player["tracker"].startswith(("http://", "https://")):
+            errors.append(f"Ligne {number} : le tracker doit être une URL.")
+            continue
+
+        registered = teams.setdefault((team_split, name), {**team, "players": []})
+        if any(registered[field] != team[field] for field in team):
+            errors.append(
+                f"Ligne {number} : l'acronyme, la ligue ou le staff de {name} diffère."
+            )
+        other = trackers.setdefault((team_split, player["tracker"]), name)
+        if other != name or any(
+            registered_player["tracker"] == player["tracker"]
+            for registered_player in registered["players"]
+        ):
+            errors.append(
+                f"Ligne {number} : le joueur {player['name']} est inscrit deux fois."
+            )
+            continue
+        registered["players"].append(player)
+
+    for (team_split, name), team in teams.items():
+        # Players without a slot take the free ones, in the order of the sheet
+        free = iter(
+            sorted(set(range(1, 6)) - {player["slot"] for player in team["players"]})
+        )
+        for player in team["players"]:
+            if player["slot"] is None:
+                player["slot"] = next(free, None)
+        slots = [player["slot"] for player in team["players"]]
+        if len(slots) < 3:
+            errors.append(f"{name} : une équipe doit compter au moins 3 joueurs.")
+        elif len(slots) > 5 or not all(slot in range(1, 6) for slot in slots):
+            errors.append(
+                f"{name} : une équipe compte au plus 5 joueurs, postes 1 à 5."
+            )
+        elif len(set(slots)) != len(slots):
+            errors.append(f"{name} : un poste est attribué deux fois.")
+    return teams
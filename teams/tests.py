@@ -1,3 +1,350 @@
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import csv
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
+from django.forms.models import inlineformset_factory
 from django.test import TestCase
+from django.urls import reverse
+
+from authentication.models import User
+from configuration.split import current_split
+from results.models import Match, MatchPlayerStat, Standing
+from teams.forms import TeamMembershipFormSet
+from teams.models import Player, Team, TeamMembership, active_memberships
+from teams.registrations import RegistrationError, read_registrations, register_teams
+
+
+def create_team(staff, name, league=1, split=1, size=3):
+    """
+    Creates a team and its players.
+
+    Args:
+        staff (User): The staff member of the team.
+        name (str): The name of the team.
+        league (int): The league of the team.
+        split (int): The split of the team.
+        size (int): The number of players of the team.
+
+    Returns:
+        Team: The created team.
+    """
+
+    team = Team.objects.create(
+        name=name, acronym=name[:4], split=split, league=league, staff=staff
+    )
+    for slot in range(1, size + 1):
+        player = Player.objects.create(
+            name=f"{name} {slot}",
+            split=split,
+            tracker=f"https://rocketleague.tracker.network/{name}{slot}",
+        )
+        TeamMembership.objects.create(team=team, player=player, slot=slot)
+    return team
+
+
+def roster(team):
+    """
+    Returns the players of a team, in slot order.
+    """
+
+    return list(
+        Player.objects.filter(
+            memberships__team=team, memberships__left__isnull=True
+        ).order_by("memberships__slot")
+    )
+
+
+class StatisticsQueriesTestCase(TestCase):
+    def setUp(self):
+        staff = User.objects.create(username="staff")
+        self.alpha = create_team(staff, "Alpha")
+        self.bravo = create_team(staff, "Bravo", size=5)
+        create_team(staff, "Charlie", size=4)
+        for match, (score_a, score_b) in zip(
+            Match.objects.order_by("id"), ((3, 1), (0, 3), (2, 2))
+        ):
+            match.team_A_score = score_a
+            match.team_B_score = score_b
+            match.save()
+            match.player_stats.update(goals=score_a, saves=score_b)
+
+    def test_player_statistics_use_one_aggregate_query(self):
+        player = Player.objects.get(name="Bravo 5")
+        with self.assertNumQueries(2):
+            Player.set_statistics(player.id)
+        player.refresh_from_db()
+        self.assertEqual((player.goals, player.saves), (3 + 2, 1 + 2))
+
+    def test_team_statistics_use_one_aggregate_query(self):
+        with self.assertNumQueries(2):
+            self.bravo.set_statistics()
+        self.bravo.refresh_from_db()
+        self.assertEqual((self.bravo.goals, self.bravo.saves), (5 * 5, 5 * 3))
+
+    def test_team_results_use_one_aggregate_query(self):
+        for team, expected in (
+            (self.alpha, (2, 1, 1, 3, 4, -1)),
+            (self.bravo, (1, 0, 1, 3, 5, -2)),
+        ):
+            with self.assertNumQueries(2):
+                team.set_teams_stats()
+            team.refresh_from_db()
+            self.assertEqual(
+                (
+                    team.matches_played,
+                    team.wins,
+                    team.lose,
+                    team.bo_wins,
+                    team.bo_lose,
+                    team.bo_diff,
+                ),
+                expected,
+            )
+
+
+class TeamMembershipTestCase(TestCase):
+    def setUp(self):
+        staff = User.objects.create(username="staff")
+        self.alpha = create_team(staff, "Alpha")
+        self.bravo = create_team(staff, "Bravo", size=5)
+
+    def test_get_team_uses_the_prefetched_memberships(self):
+        with self.assertNumQueries(2):
+            players = list(Player.objects.prefetch_related(active_memberships("team")))
+            teams = {player.name: player.get_team() for player in players}
+        self.assertEqual(teams["Alpha 1"], self.alpha)
+        self.assertEqual(teams["Bravo 5"], self.bravo)
+
+        player = Player.objects.get(name="Alpha 2")
+        with self.assertNumQueries(1):
+            self.assertEqual(player.get_team(), self.alpha)
+
+    def test_a_player_belongs_to_one_team_at_a_time(self):
+        player = Player.objects.get(name="Alpha 1")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TeamMembership.objects.create(team=self.bravo, player=player, slot=4)
+
+        # Once they have left, the player can join another team
+        TeamMembership.objects.filter(player=player).update(left=datetime.date.today())
+        TeamMembership.objects.create(team=self.alpha, player=player, slot=4)
+        self.assertEqual(player.get_team(), self.alpha)
+
+    def test_a_slot_holds_one_player_at_a_time(self):
+        player = Player.objects.create(
+            name="Newcomer", tracker="https://rocketleague.tracker.network/new"
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TeamMembership.objects.create(team=self.alpha, player=player, slot=1)
+
+    def test_deleting_a_team_does_not_update_its_matches_player_by_player(self):
+        with mock.patch.object(Match, "update_matches") as update_matches:
+            self.alpha.delete()
+            Team.objects.filter(name="Bravo").delete()
+        update_matches.assert_not_called()
+        self.assertFalse(Match.objects.exists())
+
+        # A membership deleted on its own still takes the player out of the matches
+        charlie = create_team(User.objects.get(), "Charlie", size=4)
+        with mock.patch.object(Match, "update_matches") as update_matches:
+            charlie.memberships.get(slot=4).delete()
+        update_matches.assert_called_once_with(charlie)
+
+    def submit(self, team, changes):
+        """
+        Saves the roster form of a team, with the given changes by player name.
+        """
+
+        formset_class = inlineformset_factory(
+            Team,
+            TeamMembership,
+            formset=TeamMembershipFormSet,
+            fields=("slot", "player", "joined", "left"),
+            extra=0,
+        )
+        memberships = team.memberships.filter(left__isnull=True).select_related(
+            "player"
+        )
+        prefix = formset_class.get_default_prefix()
+        data = {
+            f"{prefix}-TOTAL_FORMS": len(memberships),
+            f"{prefix}-INITIAL_FORMS": len(memberships),
+        }
+        for index, membership in enumerate(memberships):
+            values = {
+                "id": membership.pk,
+                "team": team.pk,
+                "slot": membership.slot,
+                "player": membership.player_id,
+                "joined": membership.joined,
+                "left": "",
+            }
+            values.update(changes.get(membership.player.name, {}))
+            for field, value in values.items():
+                data[f"{prefix}-{index}-{field}"] = value
+        formset = formset_class(data, instance=team, queryset=memberships)
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+
+    def test_two_players_swap_their_slots(self):
+        self.submit(self.alpha, {"Alpha 1": {"slot": 2}, "Alpha 2": {"slot": 1}})
+        self.assertEqual(
+            [player.name for player in roster(self.alpha)],
+            ["Alpha 2", "Alpha 1", "Alpha 3"],
+        )
+        match = Match.objects.filter(team_A=self.alpha).first()
+        self.assertLessEqual(
+            {"Alpha 1", "Alpha 2", "Alpha 3"},
+            set(match.player_stats.values_list("player__name", flat=True)),
+        )
+
+    def test_a_player_takes_a_slot_freed_in_the_same_submit(self):
+        self.submit(
+            self.bravo,
+            {
+                "Bravo 1": {"slot": 5},
+                "Bravo 4": {"DELETE": "on"},
+                "Bravo 5": {"left": datetime.date.today()},
+            },
+        )
+        self.assertEqual(
+            [player.name for player in roster(self.bravo)],
+            ["Bravo 2", "Bravo 3", "Bravo 1"],
+        )
+        self.assertTrue(
+            TeamMembership.objects.filter(
+                player__name="Bravo 5", left__isnull=False
+            ).exists()
+        )
+
+
+class TeamsViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # The split is read once per process, not by each request
+        current_split()
+        staff = User.objects.create(username="staff")
+        for number in range(6):
+            create_team(staff, f"Team {number}", size=3 + number % 3)
+        Team.objects.create(name="Empty", acronym="EMP", staff=staff)
+        TeamMembership.objects.filter(team__name="Team 1", slot=4).update(
+            left=datetime.date.today()
+        )
+
+    def test_teams_page_uses_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("teams"))
+
+        teams = {team["name"]: team["players"] for team in response.context["teams"]}
+        self.assertEqual(len(teams), 7)
+        self.assertEqual(teams["Empty"], [None] * 5)
+        self.assertEqual(
+            teams["Team 1"], ["Team 1 1", "Team 1 2", "Team 1 3", None, None]
+        )
+        self.assertEqual(teams["Team 2"], [f"Team 2 {slot}" for slot in range(1, 6)])
+
+
+class RegistrationTestCase(TestCase):
+    def setUp(self):
+        User.objects.create(username="staff")
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "registrations.csv"
+
+    def register(self, lines):
+        with self.path.open("w", newline="") as file:
+            writer = csv.DictWriter(
+                file,
+                fieldnames=("team", "acronym", "league", "staff", "player", "tracker"),
+            )
+            writer.writeheader()
+            writer.writerows(lines)
+        call_command(
+            "register_teams", str(self.path), "--split", "2", stdout=StringIO()
+        )
+
+    def lines(self, name, league=1, size=5):
+        return [
+            {
+                "team": name,
+                "acronym": name[:4],
+                "league": league,
+                "staff": "staff",
+                "player": f"{name} {slot}",
+                "tracker": f"https://rocketleague.tracker.network/{name}{slot}",
+            }
+            for slot in range(1, size + 1)
+        ]
+
+    def test_two_hundred_teams_are_registered_in_bulk(self):
+        lines = [
+            line
+            for league in range(1, 21)
+            for number in range(10)
+            for line in self.lines(f"T{league}-{number}", league)
+        ]
+        # About a dozen queries per league, instead of dozens per team
+        with self.assertNumQueries(294):
+            self.register(lines)
+
+        self.assertEqual(Team.objects.filter(split=2).count(), 200)
+        self.assertEqual(TeamMembership.objects.count(), 1000)
+        matches = Match.objects.filter(split=2)
+        self.assertEqual(matches.count(), 20 * 45)
+        self.assertFalse(matches.filter(week__isnull=True).exists())
+        self.assertEqual(MatchPlayerStat.objects.count(), 20 * 45 * 10)
+        self.assertEqual(Standing.objects.filter(split=2, league=7).count(), 10)
+
+    def test_a_free_player_of_the_split_is_reused(self):
+        lines = self.lines("Alpha", size=3)
+        free = Player.objects.create(
+            name="Alpha 1", split=2, tracker=lines[0]["tracker"]
+        )
+        self.register(lines)
+        self.assertEqual(Player.objects.count(), 3)
+        self.assertEqual(Team.objects.get().memberships.get(slot=1).player, free)
+
+    def test_an_invalid_sheet_is_refused_as_a_whole(self):
+        self.register(self.lines("Alpha", size=3))
+        lines = (
+            self.lines("Alpha", size=3)
+            + self.lines("Bravo", size=2)
+            + self.lines("Charlie", size=3)
+        )
+        lines[-1]["staff"] = "nobody"
+        lines[-2]["tracker"] = lines[3]["tracker"]
+
+        with self.assertRaises(CommandError) as error:
+            self.register(lines)
+        message = str(error.exception)
+        self.assertIn("Alpha : l'équipe est déjà inscrite au split 2.", message)
+        self.assertIn("Bravo : une équipe doit compter au moins 3 joueurs.", message)
+        self.assertIn("Ligne 7 : le joueur Charlie 2 est inscrit deux fois.", message)
+        self.assertIn("l'acronyme, la ligue ou le staff de Charlie diffère", message)
+        self.assertEqual(Team.objects.count(), 1)
+
+    def test_short_lines_are_reported(self):
+        self.path.write_text(
+            "team,acronym,league,staff,player,tracker\n"
+            "Alpha,ALPH,1,staff,Alpha 1,https://rocketleague.tracker.network/a1\n"
+            "Bravo,BRAV\n"
+        )
+
+        with self.assertRaises(RegistrationError) as error:
+            register_teams(read_registrations(str(self.path)), 2)
+        self.assertIn("Ligne 2 : la colonne 'league' manque.", error.exception.errors)
+
+    def test_a_sheet_saved_with_a_byte_order_mark_is_read(self):
+        self.path.write_text(
+            "team,acronym,league,staff,player,tracker\n"
+            "Alpha,ALPH,1,staff,Alpha 1,https://rocketleague.tracker.network/a1\n",
+            encoding="utf-8-sig",
+        )
 
-# Create your tests here.
+        lines = read_registrations(str(self.path))
+        self.assertEqual(lines[0]["team"], "Alpha")
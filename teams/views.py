@@ -1,8 +1,11 @@
 from django.shortcuts import render
+from django.db.models import FilteredRelation, Q
 from teams.models import Team
-from interligue import settings
+from configuration.split import current_split
+from interligue.pages import cached_page
 
 
+@cached_page("teams")
 def teams(request):
     """
     A view that retrieves all teams from the database and renders them in the teams.html template.
@@ -14,11 +17,30 @@ def teams(request):
         HttpResponse: The HTTP response containing the rendered HTML.
     """
 
-    # Retrieve all teams from the database
-    teams = Team.objects.all().order_by("name").filter(split=settings.split)
+    # Retrieve the teams and the names of their current players with one query
+    rows = (
+        Team.objects.filter(split=current_split())
+        .annotate(
+            roster=FilteredRelation(
+                "memberships", condition=Q(memberships__left__isnull=True)
+            )
+        )
+        .order_by("name", "id")
+        .values("id", "name", "league", "roster__slot", "roster__player__name")
+    )
+
+    # Lay the players of each team out over its five slots
+    teams = {}
+    for row in rows:
+        team = teams.setdefault(
+            row["id"],
+            {"name": row["name"], "league": row["league"], "players": [None] * 5},
+        )
+        if row["roster__slot"] is not None:
+            team["players"][row["roster__slot"] - 1] = row["roster__player__name"]
 
     # Create a context dictionary containing the teams
-    context = {"teams": teams}
+    context = {"teams": list(teams.values())}
 
     # Render the template with the context
     return render(request, "teams.html", context)